@@ -0,0 +1,392 @@
+"""Benchmarks for graphics.py.
+
+These open real windows, so they need a display. Without one (no DISPLAY
+on Linux) they re-run themselves under xvfb-run, or a bare Xvfb server,
+if either is installed. Run with:
+
+    python benchmarks.py                       # timed suite, as a table
+    python benchmarks.py --json results.json   # ... also saved as JSON
+    python benchmarks.py --save-baseline base.json
+    python benchmarks.py --baseline base.json  # exit 1 on a regression
+    python benchmarks.py --stress              # pooling/drawMany/renderFrames stress tests
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+
+
+def ensureDisplay():
+    """Make sure there is an X display for Tk to open, starting a virtual
+    one if needed. Must be called before graphics is imported."""
+    if not sys.platform.startswith("linux") or os.environ.get("DISPLAY"):
+        return
+    if _which("xvfb-run") and not os.environ.get("BENCHMARK_XVFB"):
+        os.environ["BENCHMARK_XVFB"] = "1"  # don't loop if it fails
+        os.execvp("xvfb-run", ["xvfb-run", "-a", "-s", "-screen 0 1024x768x24",
+                               sys.executable] + sys.argv)
+    elif _which("Xvfb"):
+        display = ":{}".format(90 + os.getpid() % 100)
+        server = subprocess.Popen(["Xvfb", display, "-screen", "0", "1024x768x24"],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(1)  # give the server time to accept connections
+        os.environ["DISPLAY"] = display
+        import atexit
+        atexit.register(server.terminate)
+    else:
+        sys.exit("benchmarks: no display, and neither xvfb-run nor Xvfb is installed")
+
+
+def _which(program):
+    for folder in os.environ.get("PATH", "").split(os.pathsep):
+        if os.access(os.path.join(folder, program), os.X_OK):
+            return True
+    return False
+
+
+if __name__ == "__main__":
+    ensureDisplay()
+
+from graphics import *
+
+
+def particles(win, frames=200, spawn=100, lifetime=10):
+    """Spawn and kill short-lived circles the way a particle system would.
+    Returns the number of objects drawn."""
+    rng = random.Random(0)
+    alive = []
+    drawn = 0
+    for frame in range(frames):
+        for i in range(spawn):
+            c = Circle(Point(rng.uniform(0, win.getWidth()), rng.uniform(0, win.getHeight())), 3,
+                       fill="orange", outline="")
+            c.draw(win)
+            alive.append((frame, c))
+        drawn += spawn
+        while alive and alive[0][0] <= frame - lifetime:
+            alive.pop(0)[1].undraw()
+        update()
+    for frame, c in alive:
+        c.undraw()
+    return drawn
+
+
+def benchPool(frames=200, spawn=100, lifetime=10):
+    """Compare particle throughput with and without item pooling"""
+    results = {}
+    for pooled in (False, True):
+        win = GraphWin("Pool benchmark", 400, 400, autoflush=False)
+        if pooled:
+            win.enablePool(spawn * lifetime)
+        start = time.time()
+        drawn = particles(win, frames, spawn, lifetime)
+        elapsed = time.time() - start
+        results[pooled] = drawn / elapsed
+        print("{:>10}: {:>10.0f} objects/s  {}".format("pooled" if pooled else "unpooled", drawn / elapsed,
+                                                    win.poolStats() or ""))
+        win.close()
+    print("speedup: {:.2f}x".format(results[True] / results[False]))
+    return results
+
+
+def board(size=100, cell=4):
+    return [Rectangle(Point(x*cell, y*cell), Point((x+1)*cell, (y+1)*cell), fill="gray", outline="")
+            for x in range(size) for y in range(size)]
+
+
+def benchDrawMany(size=100):
+    """Compare drawing a size x size board of Rectangles one at a time
+    against a single drawMany call"""
+    results = {}
+    for bulk in (False, True):
+        win = GraphWin("drawMany benchmark", 400, 400)
+        cells = board(size)
+        start = time.time()
+        if bulk:
+            win.drawMany(cells)
+        else:
+            for cell in cells:
+                cell.draw(win)
+        update()
+        elapsed = time.time() - start
+        results[bulk] = len(cells) / elapsed
+        print("{:>10}: {:>10.0f} objects/s".format("drawMany" if bulk else "draw", len(cells) / elapsed))
+        win.close()
+    print("speedup: {:.2f}x".format(results[True] / results[False]))
+    return results
+
+
+def frameSetup(win):
+    objects = shapes(500)
+    win.drawMany(objects)
+    return {"objects": objects, "offset": 0}
+
+
+def frameStep(win, state, frame):
+    # Moves everything to where it is in this frame, whatever came before
+    offset = frame % 20
+    for obj in state["objects"]:
+        obj.move(offset - state["offset"], 0)
+    state["offset"] = offset
+
+
+def benchRenderFrames(frames=64):
+    """Compare renderFrames throughput as the number of processes doubles
+    up to the number of cores"""
+    results = {}
+    counts = [1]
+    while counts[-1] * 2 <= os.cpu_count():
+        counts.append(counts[-1] * 2)
+    folder = tempfile.mkdtemp()
+    try:
+        for processes in counts:
+            filename = os.path.join(folder, "frame{:04d}.svg")
+            start = time.time()
+            renderFrames(frameSetup, frameStep, frames, filename, 400, 400, processes)
+            elapsed = time.time() - start
+            results[processes] = frames / elapsed
+            print("{:>10}: {:>10.1f} frames/s  {:.2f}x".format(
+                "{} proc".format(processes), frames / elapsed, results[processes] / results[1]))
+    finally:
+        shutil.rmtree(folder)
+    return results
+
+
+# The timed suite. Each case is a function taking a window and returning a
+#   function to time and the number of operations one call of it performs;
+#   the result is the best time per operation over several calls. Objects
+#   are made from a fixed seed so every run does the same work.
+
+def shapes(n=1000, seed=0):
+    rng = random.Random(seed)
+    objects = []
+    for i in range(n):
+        x, y = rng.uniform(10, 390), rng.uniform(10, 390)
+        kind = i % 4
+        if kind == 0:
+            objects.append(Rectangle(Point(x-5, y-5), Point(x+5, y+5)))
+        elif kind == 1:
+            objects.append(Circle(Point(x, y), 5))
+        elif kind == 2:
+            objects.append(Line(Point(x-5, y), Point(x+5, y)))
+        else:
+            objects.append(Polygon(Point(x-5, y+5), Point(x, y-5), Point(x+5, y+5)))
+    return objects
+
+
+def caseStartup(win):
+    command = [sys.executable, "-c", "import graphics; graphics._root.destroy()"]
+    here = os.path.dirname(os.path.abspath(__file__))
+    return lambda: subprocess.check_call(command, cwd=here), 1
+
+
+def caseDraw(win):
+    objects = shapes()
+
+    def run():
+        for obj in objects:
+            obj.draw(win)
+        for obj in objects:
+            obj.undraw()
+    return run, 2 * len(objects)
+
+
+def caseMove(win):
+    objects = shapes()
+    win.drawMany(objects)
+
+    def run():
+        for obj in objects:
+            obj.move(1, 0)
+        for obj in objects:
+            obj.move(-1, 0)
+    return run, 2 * len(objects)
+
+
+def caseReconfig(win):
+    objects = shapes()
+    win.drawMany(objects)
+
+    def run():
+        for obj in objects:
+            obj.setWidth(2)
+        for obj in objects:
+            obj.setWidth(1)
+    return run, 2 * len(objects)
+
+
+def caseRedraw(win):
+    win.drawMany(shapes())
+
+    def run():
+        win.setCoords(0, 0, 400, 400)
+        win.setCoords(0, 0, 200, 200)
+    return run, 2
+
+
+def caseContains(make):
+    def run(win):
+        rng = random.Random(1)
+        objects = [make(rng.uniform(10, 390), rng.uniform(10, 390)) for i in range(200)]
+        points = [Point(rng.uniform(0, 400), rng.uniform(0, 400)) for i in range(50)]
+
+        def test():
+            for obj in objects:
+                for p in points:
+                    obj.containsPoint(p)
+        return test, len(objects) * len(points)
+    return run
+
+
+def caseCollisions(win):
+    # 10,000 small shapes, a tenth of them moving, as a game would check
+    #   every frame; 60 frames a second leaves about 16000 us per call
+    rng = random.Random(2)
+    objects = [Circle(Point(rng.uniform(0, 400), rng.uniform(0, 400)), 2) for i in range(10000)]
+    win.drawMany(objects)
+    moving = objects[::10]
+
+    def run():
+        for obj in moving:
+            obj.move(rng.uniform(-1, 1), rng.uniform(-1, 1))
+        win.collisions()
+    return run, 1
+
+
+def casePlot(win):
+    def run():
+        for x in range(400):
+            win.plot(x, x % 7, "red")
+        win.delete("all")
+    return run, 400
+
+
+def casePixels(win):
+    image = Image(Point(50, 50), 100, 100)
+    image.draw(win)
+
+    def run():
+        for x in range(100):
+            image.setPixel(x, x, "red")
+            image.getPixel(x, x)
+    return run, 200
+
+
+def caseImageArrays(win):
+    image = Image(Point(100, 100), 200, 200)
+    image.draw(win)
+    pixels = np.zeros((200, 200, 3), dtype=np.uint8)
+
+    def run():
+        image.setPixels(pixels)
+        image.getPixels()
+    return run, 2
+
+
+SUITE = [
+    ("startup", caseStartup),
+    ("draw/undraw", caseDraw),
+    ("move", caseMove),
+    ("reconfig", caseReconfig),
+    ("redraw", caseRedraw),
+    ("contains/rectangle", caseContains(lambda x, y: Rectangle(Point(x-5, y-5), Point(x+5, y+5)))),
+    ("contains/circle", caseContains(lambda x, y: Circle(Point(x, y), 5))),
+    ("contains/line", caseContains(lambda x, y: Line(Point(x-5, y), Point(x+5, y)))),
+    ("contains/polygon", caseContains(lambda x, y: Polygon(Point(x-5, y+5), Point(x, y-5), Point(x+5, y+5)))),
+    ("contains/text", caseContains(lambda x, y: Text(Point(x, y), "label"))),
+    ("contains/entry", caseContains(lambda x, y: Entry(Point(x, y), 5))),
+    ("contains/image", caseContains(lambda x, y: Image(Point(x, y), 10, 10))),
+    ("collisions", caseCollisions),
+    ("plot", casePlot),
+    ("image/pixel", casePixels),
+    ("image/arrays", caseImageArrays),
+]
+
+
+def runSuite(repeat=5, only=None):
+    """Run the timed suite, returning {case name: best seconds per
+    operation}"""
+    results = {}
+    for name, case in SUITE:
+        if only and not any(word in name for word in only):
+            continue
+        win = GraphWin("Benchmark", 400, 400, autoflush=False)
+        try:
+            run, ops = case(win)
+            run()  # warm up caches
+            best = None
+            for i in range(repeat):
+                start = time.perf_counter()
+                run()
+                update()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+        finally:
+            win.close()
+        results[name] = best / ops
+        print("{:<20} {:>12.2f} us/op".format(name, results[name] * 1e6))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print how results compare with baseline and return the names of the
+    cases more than tolerance (a fraction) slower"""
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        ratio = results[name] / baseline[name]
+        slower = ratio > 1 + tolerance
+        if slower:
+            regressions.append(name)
+        print("{:<20} {:>8.2f}x {}".format(name, ratio, "REGRESSION" if slower else ""))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark graphics.py")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case (best is kept)")
+    parser.add_argument("--only", nargs="*", help="run only cases whose names contain one of these")
+    parser.add_argument("--json", help="write the results to this file as JSON")
+    parser.add_argument("--save-baseline", help="write the results to this file as the new baseline")
+    parser.add_argument("--baseline", help="compare with this baseline, exiting 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fraction slower than the baseline that counts as a regression")
+    parser.add_argument("--stress", action="store_true",
+                        help="run the pooling, drawMany and renderFrames stress tests")
+    args = parser.parse_args(argv)
+
+    if args.stress:
+        benchPool()
+        benchDrawMany()
+        benchRenderFrames()
+        return 0
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tk": tk.TkVersion,
+        "repeat": args.repeat,
+        "results": runSuite(args.repeat, args.only),
+    }
+    for filename in (args.json, args.save_baseline):
+        if filename:
+            with open(filename, "w") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(report["results"], baseline, args.tolerance)
+        if regressions:
+            print("{} regression(s): {}".format(len(regressions), ", ".join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,39 @@
 import time
 import os
+import re
+import json
+import struct
+import binascii
+import weakref
+import bisect
+import itertools
+import threading
+import collections
+import multiprocessing
 import matplotlib.path as mpl_path
 import numpy as np
-from math import sqrt, pow
+from math import sqrt, pow, floor, pi, cos, sin
+from xml.sax.saxutils import escape, quoteattr
 
 
 try:  # import as appropriate for 2.x vs. 3.x
     import tkinter as tk
+    import tkinter.font as tkfont
+    import queue
 except:
     import Tkinter as tk
+    import tkFont as tkfont
+    import Queue as queue
+
+try:  # only needed for drawing from worker threads, 3.x only
+    from concurrent.futures import Future
+except ImportError:
+    Future = None
+
+try:  # only needed for awaitable input, 3.x only
+    import asyncio
+except ImportError:
+    asyncio = None
 
 
 ##########################################################################
@@ -24,9 +49,77 @@ UNSUPPORTED_METHOD = "Object doesn't support operation"
 BAD_OPTION = "Illegal option value"
 DEAD_THREAD = "Graphics thread quit unexpectedly"
 
+# Dirty rectangles are merged into one once a window collects this many
+MAX_DIRTY_RECTS = 64
+
+# Extra screen margin, in pixels, around the view in which a virtual
+#   GraphWin keeps canvas items for objects
+VIRTUAL_MARGIN = 50
+
+# Objects covering more grid cells than this are kept outside the grid
+SPATIAL_HASH_MAX_CELLS = 64
+
+# The collision grid is rebuilt when the average object size drifts more
+#   than this factor away from the size its cells were chosen for
+COLLIDE_RESIZE = 2.0
+
+# Tag given to the canvas items of objects with enter/leave/click handlers
+HANDLER_TAG = "graphicsHandlers"
+
+# Number of sides of the polygon used in place of an oval when testing two
+#   ovals for intersection
+ELLIPSE_SIDES = 64
+
+# Level of detail: polygons with at least LOD_MIN_VERTICES vertices are
+#   simplified so no vertex is off by more than the window's tolerance in
+#   pixels. Each polygon caches the result for LOD_CACHE_SIZE zoom levels.
+LOD_TOLERANCE = 0.5
+LOD_MIN_VERTICES = 64
+LOD_CACHE_SIZE = 4
+
+# Number of measured (font, text) sizes kept for getBoundingBox, and the
+#   pixels of border and padding around the text of an Entry on each side
+TEXT_CACHE_SIZE = 10000
+ENTRY_PADDING = 3
+
+# Number of Colors kept so that asking for one again returns the same object
+COLOR_CACHE_SIZE = 65536
+
+# Rough memory cost in bytes of one canvas item, counting its Tk record and
+#   the Python object behind it, and of one pixel of a Tk photo image
+ITEM_BYTES = 400
+PIXEL_BYTES = 4
+
+# Scene files start with SCENE_MAGIC; loadScene draws objects in batches
+#   of SCENE_BATCH as it reads them
+SCENE_MAGIC = b"PGSCENE1"
+SCENE_BATCH = 10000
+
+# Words that can appear in generated Tcl scripts without quoting, and the
+#   characters that need escaping when braces can't be used
+_TCL_BARE = re.compile(r"^[\w#.,:+-]+\Z")
+_TCL_UNSAFE = re.compile(r"[\\\n{}]")
+_TCL_SPECIAL = re.compile(r"[\\\[\]{}\"$\n]")
+_TCL_ESCAPES = {"\n": "\\n"}
+
+# Input events buffered per async event iterator before the oldest are dropped
+EVENT_QUEUE_SIZE = 1000
+
+# Commands queued by worker threads: the most that may be waiting before
+#   invoke blocks, the most run per tick, and the tick length in ms
+COMMAND_QUEUE_SIZE = 10000
+COMMAND_BATCH_SIZE = 1000
+COMMAND_TICK = 10
+
 _root = tk.Tk()
 _root.withdraw()
 _update_lasttime = time.time()
+_mainThread = threading.current_thread()
+_commands = queue.Queue(COMMAND_QUEUE_SIZE)
+_deferFlush = 0  # nonzero while autoflush updates are held back
+_bridges = {}  # asyncio event loop -> AsyncBridge pumping Tk events for it
+_windows = weakref.WeakSet()  # every GraphWin, until it is closed and dropped
+_instanceTags = itertools.count()  # numbers the canvas tags of definitions
 
 
 def update(rate=None):
@@ -41,6 +134,209 @@ def update(rate=None):
             _update_lasttime = now
     _root.update()
 
+
+def resourceStats():
+    """Return a dictionary totalling GraphWin.resourceStats over every open
+    window, plus the number of open windows and the images in
+    Image.imageCache, which only holds images that are drawn"""
+    totals = collections.Counter()
+    windows = [win for win in list(_windows) if not win.isClosed()]
+    for win in windows:
+        totals.update(win.resourceStats())
+    totals["windows"] = len(windows)
+    totals["cachedImages"] = len(Image.imageCache)
+    totals["cachedImageBytes"] = sum(_imageBytes(img) for img in list(Image.imageCache.values()))
+    return dict(totals)
+
+
+def invoke(func, *args, **kwargs):
+    """Run func(*args, **kwargs) on the graphics thread and return a Future
+    for its result. May be called from any thread; worker threads block while
+    the command queue is full."""
+    if Future is None:
+        raise GraphicsError(UNSUPPORTED_METHOD)
+    future = Future()
+    if threading.current_thread() is _mainThread:
+        _runCommand(future, func, args, kwargs)
+        return future
+    command = (future, func, args, kwargs)
+    while True:
+        try:
+            _commands.put(command, timeout=.1)
+            return future
+        except queue.Full:
+            if not _mainThread.is_alive():
+                raise GraphicsError(DEAD_THREAD)
+
+
+def _runCommand(future, func, args, kwargs):
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+
+
+def _drainCommands():
+    # Runs queued commands in batches every COMMAND_TICK ms, whenever the
+    #   graphics thread is processing Tk events. Autoflush is held back
+    #   while a batch runs; Tk redraws once the batch is done.
+    global _deferFlush
+    _deferFlush += 1
+    try:
+        for i in range(COMMAND_BATCH_SIZE):
+            try:
+                command = _commands.get_nowait()
+            except queue.Empty:
+                break
+            _runCommand(*command)
+    finally:
+        _deferFlush -= 1
+        _root.after(COMMAND_TICK, _drainCommands)
+
+
+def _asyncLoop():
+    if asyncio is None:
+        raise GraphicsError(UNSUPPORTED_METHOD)
+    try:
+        return asyncio.get_running_loop()
+    except (AttributeError, RuntimeError):
+        return asyncio.get_event_loop()
+
+
+def asyncBridge(rate=60, loop=None):
+    """Process Tk events from an asyncio event loop rate times a second,
+    so GraphWins and coroutines can share one thread. Returns the running
+    AsyncBridge for loop (by default the current event loop)."""
+    if loop is None:
+        loop = _asyncLoop()
+    bridge = _bridgeFor(loop)
+    if bridge is None:
+        bridge = AsyncBridge(loop, rate)
+    bridge.rate = rate
+    bridge.start()
+    return bridge
+
+
+def _bridgeFor(loop):
+    # The AsyncBridge running for loop, or None. asyncio has no hook for a
+    #   loop closing, so the bridges of closed loops are stopped here.
+    for other in [other for other in _bridges if other.is_closed()]:
+        _bridges[other].stop()
+    return _bridges.get(loop)
+
+
+class AsyncBridge:
+
+    """Pumps Tk events from an asyncio event loop at a fixed rate"""
+
+    def __init__(self, loop, rate=60):
+        self.loop = loop
+        self.rate = rate
+        self._handle = None
+
+    def __repr__(self):
+        return "AsyncBridge({})".format(self.rate)
+
+    def isRunning(self):
+        return self._handle is not None
+
+    def start(self):
+        if self._handle is None:
+            _bridges[self.loop] = self
+            self._handle = self.loop.call_soon(self._pump)
+        return self
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if _bridges.get(self.loop) is self:
+            del _bridges[self.loop]
+        return self
+
+    def _pump(self):
+        try:
+            _root.update()
+        except tk.TclError:  # Tk has been shut down
+            self.stop()
+            return
+        if self._handle is not None:
+            self._handle = self.loop.call_later(1.0 / self.rate, self._pump)
+
+
+class _EventStream:
+
+    """Internal async iterator over the input events of a GraphWin"""
+
+    def __init__(self, win):
+        self.win = win
+        self.events = collections.deque(maxlen=EVENT_QUEUE_SIZE)
+        self.future = None
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        loop = _asyncLoop()
+        future = loop.create_future()
+        if self.events:
+            future.set_result(self.events.popleft())
+        elif self.closed:
+            future.set_exception(StopAsyncIteration())
+        else:
+            self.future = future
+            if _bridgeFor(loop) is None:
+                asyncBridge(loop=loop)
+        return future
+
+    def aclose(self):
+        """Stop collecting events"""
+        self._close()
+        future = _asyncLoop().create_future()
+        future.set_result(None)
+        return future
+
+    def _put(self, event):
+        if self.future is not None and not self.future.done():
+            self.future.set_result(event)
+            self.future = None
+        else:
+            self.events.append(event)
+
+    def _close(self):
+        self.closed = True
+        if self in self.win._streams:
+            self.win._streams.remove(self)
+        if self.future is not None and not self.future.done():
+            self.future.set_exception(StopAsyncIteration())
+
+
+class ThreadProxy:
+
+    """Wraps a graphics object so its methods can be called from worker
+    threads. Each call is queued for the graphics thread and returns a
+    Future, e.g. ThreadProxy(entry).getText().result()"""
+
+    def __init__(self, target):
+        self._target = target
+
+    def __repr__(self):
+        return "ThreadProxy({})".format(self._target)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return invoke(attr, *args, **kwargs)
+        return call
+
 ############################################################################
 # Graphics classes start here
 
@@ -65,7 +361,17 @@ class GraphWin(tk.Canvas):
         self.mouseY2 = None
         self.bind("<Button-1>", self._onClick1)
         self.bind("<Button-2>", self._onClick2)
-        self.bind_all("<Key>", self._onKey)
+        self.bind("<Enter>", self._onMotion)
+        self.bind("<Motion>", self._onMotion)
+        self.bind("<Leave>", self._onLeave)
+        self.bind("<Map>", self._onMap)
+        self.tag_bind(HANDLER_TAG, "<Enter>", lambda e: self._onItemEvent("enter", e))
+        self.tag_bind(HANDLER_TAG, "<Leave>", lambda e: self._onItemEvent("leave", e))
+        self.tag_bind(HANDLER_TAG, "<Button-1>", lambda e: self._onItemEvent("click", e))
+        self.mouseX = None  # last pointer position seen, None when outside
+        self.mouseY = None
+        self._handlerItems = {}  # canvas item id -> object with handlers
+        master.bind("<Key>", self._onKey)
         self.height = height
         self.width = width
         self.autoflush = autoflush
@@ -73,10 +379,20 @@ class GraphWin(tk.Canvas):
         self._mouseCallback2 = None
         self.trans = None
         self.closed = False
+        self._pool = None
+        self._dirty = None
+        self._virtual = None  # spatial index of items, in virtual mode
+        self.lodTolerance = LOD_TOLERANCE
+        self._collide = None  # spatial index for collisions, made when needed
+        self._waiters = []  # (event kind, asyncio future) pairs
+        self._streams = []  # async event iterators
+        _windows.add(self)
         master.lift()
         self.lastKey = ""
         if autoflush:
             _root.update()
+        if self.winfo_ismapped():
+            self._onMap(None)
 
     def __repr__(self):
         if self.isClosed():
@@ -93,11 +409,13 @@ class GraphWin(tk.Canvas):
 
     def _onKey(self, evnt):
         self.lastKey = evnt.keysym
+        self._postEvent("key", evnt.keysym)
 
     def setBackground(self, color):
         """Set background color of the window"""
         self.__checkOpen()
         self.config(bg=color)
+        self.markDirty(0, 0, self.width, self.height)
         self.__autoflush()
         
     def setCoords(self, x1, y1, x2, y2):
@@ -106,12 +424,55 @@ class GraphWin(tk.Canvas):
         self.trans = Transform(self.width, self.height, x1, y1, x2, y2)
         self.redraw()
 
+    def setLevelOfDetail(self, tolerance):
+        """Draw polygons with many vertices simplified so that no vertex is
+        more than tolerance pixels out of place. 0 draws every vertex."""
+        self.__checkOpen()
+        self.lodTolerance = tolerance
+        self.redraw()
+        return self
+
+    def lodStats(self):
+        """Return a dictionary with the number of drawn polygons and their
+        total vertex counts before and after simplification"""
+        polygons = vertices = drawn = 0
+        for item in self.items:
+            counts = getattr(item, "lodCounts", None)
+            if counts and item.id is not None:
+                polygons += 1
+                vertices += counts[0]
+                drawn += counts[1]
+        return {"polygons": polygons, "vertices": vertices, "drawn": drawn}
+
     def close(self):
         """Close the window"""
 
         if self.closed:
             return
         self.closed = True
+        for kind, future in self._waiters:
+            if not future.done():
+                future.set_exception(GraphicsError("window is closed"))
+        self._waiters = []
+        for stream in self._streams[:]:
+            stream._close()
+        # Let go of everything drawn, so that neither the objects nor this
+        #   window keep the other (or any images) alive
+        for item in self.items:
+            if isinstance(item, Image):
+                Image.imageCache.pop(item.imageId, None)
+            item.canvas = None
+            item.id = None
+        self.items = []
+        self._pool = None
+        self._virtual = None
+        self._shown = self._unindexed = set()
+        self._drawOrder = {}
+        self._collide = None
+        self._dirty = None
+        self._handlerItems = {}
+        self._mouseCallback = None
+        self._mouseCallback2 = None
         self.master.destroy()
         self.__autoflush()
 
@@ -122,7 +483,7 @@ class GraphWin(tk.Canvas):
         return not self.closed
 
     def __autoflush(self):
-        if self.autoflush:
+        if self.autoflush and not _deferFlush:
             _root.update()
 
     def plot(self, x, y, color="black"):
@@ -130,6 +491,7 @@ class GraphWin(tk.Canvas):
         self.__checkOpen()
         xs, ys = self.toScreen(x, y)
         self.create_line(xs, ys, xs+1, ys, fill=color)
+        self.markDirty(xs, ys, xs+1, ys+1)
         self.__autoflush()
         
     def plotPixel(self, x, y, color="black"):
@@ -137,6 +499,7 @@ class GraphWin(tk.Canvas):
         (x,y) to color"""
         self.__checkOpen()
         self.create_line(x, y, x+1, y, fill=color)
+        self.markDirty(x, y, x+1, y+1)
         self.__autoflush()
       
     def flush(self):
@@ -203,12 +566,40 @@ class GraphWin(tk.Canvas):
                 return None
 
     def checkMousePosition(self):
-        x = self.master.winfo_pointerx()-self.master.winfo_rootx()
-        y = self.master.winfo_pointery()-self.master.winfo_rooty()
-        if 0 <= x <= self.width and 0 <= y <= self.height:
-            return Point(x, y)
-        else:
+        """Return the last pointer position seen over the window, or None
+        if the pointer is outside it"""
+        if self.mouseX is None:
             return None
+        return Point(self.mouseX, self.mouseY)
+
+    def _onMotion(self, e):
+        self.mouseX = e.x
+        self.mouseY = e.y
+
+    def _onMap(self, e):
+        # Tk only reports the pointer once it moves, so start from where it
+        #   is once the window is on screen and its position is known
+        x, y = self.winfo_pointerxy()
+        x, y = x - self.winfo_rootx(), y - self.winfo_rooty()
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.mouseX = x
+            self.mouseY = y
+
+    def _onLeave(self, e):
+        if e.detail == "NotifyInferior":
+            return  # the pointer went onto a widget in the window, like an Entry
+        self.mouseX = None
+        self.mouseY = None
+
+    def _onItemEvent(self, kind, e):
+        # Tk has already found the topmost item under the pointer and made
+        #   it "current", so all that's left is to look up its object
+        current = self.find_withtag("current")
+        item = self._handlerItems.get(current[0]) if current else None
+        if item is not None and item._handlers:
+            func = item._handlers.get(kind)
+            if func:
+                func(Point(*self.toWorld(e.x, e.y)))
 
     def getKey(self):
         """Wait for user to press a key and return it as a string."""
@@ -231,6 +622,49 @@ class GraphWin(tk.Canvas):
         key = self.lastKey
         self.lastKey = ""
         return key
+
+    def mouse(self, mouseButton=1):
+        """Awaitable version of getMouse: await win.mouse() returns a Point
+        for the next click without blocking the asyncio event loop"""
+        return self._waitFor("mouse{}".format(mouseButton))
+
+    def key(self):
+        """Awaitable version of getKey: await win.key() returns the next
+        key pressed"""
+        return self._waitFor("key")
+
+    def events(self):
+        """Return an async iterator over the window's input events, each
+        a ("mouse1", Point), ("mouse2", Point) or ("key", keysym) pair.
+        Iteration stops when the window is closed."""
+        self.__checkOpen()
+        stream = _EventStream(self)
+        self._streams.append(stream)
+        return stream
+
+    def _waitFor(self, kind):
+        self.__checkOpen()
+        loop = _asyncLoop()
+        future = loop.create_future()
+        # Drop waiters that were cancelled, e.g. by asyncio.wait_for
+        self._waiters = [waiter for waiter in self._waiters if not waiter[1].done()]
+        self._waiters.append((kind, future))
+        if _bridgeFor(loop) is None:
+            asyncBridge(loop=loop)
+        return future
+
+    def _postEvent(self, kind, value):
+        # Internal method that hands an input event to waiting coroutines
+        if self._waiters:
+            waiting = self._waiters
+            self._waiters = []
+            for waiter in waiting:
+                if waiter[0] != kind:
+                    self._waiters.append(waiter)
+                elif not waiter[1].done():
+                    waiter[1].set_result(value)
+        for stream in self._streams:
+            stream._put((kind, value))
             
     def getHeight(self):
         """Return the height of the window"""
@@ -265,33 +699,912 @@ class GraphWin(tk.Canvas):
         self.mouseY1 = e.y
         if self._mouseCallback:
             self._mouseCallback(Point(e.x, e.y))
+        if self._waiters or self._streams:
+            self._postEvent("mouse1", Point(*self.toWorld(e.x, e.y)))
 
     def _onClick2(self, e):
         self.mouseX2 = e.x
         self.mouseY2 = e.y
         if self._mouseCallback2:
             self._mouseCallback2(Point(e.x, e.y))
+        if self._waiters or self._streams:
+            self._postEvent("mouse2", Point(*self.toWorld(e.x, e.y)))
 
     def addItem(self, item):
         self.items.append(item)
+        if self._virtual is not None:
+            self._addVirtual(item)
+        if self._collide is not None and item._shape() is not None:
+            self._collide.insert(item, item._worldBBox())
 
     def delItem(self, item):
         self.items.remove(item)
+        if self._virtual is not None:
+            self._delVirtual(item)
+        if self._collide is not None:
+            self._collide.remove(item)
+
+    def _delItems(self, items):
+        # Internal bulk version of delItem
+        drop = set(map(id, items))
+        self.items = [item for item in self.items if id(item) not in drop]
+        for item in items:
+            if self._virtual is not None:
+                self._delVirtual(item)
+            if self._collide is not None:
+                self._collide.remove(item)
+
+    def collisions(self):
+        """Return a list of (a, b) pairs, in no particular order, of the
+        Rectangles, Ovals, Circles, Lines, Polygons and Points drawn in the
+        window that overlap each other"""
+        if self._collide is None:
+            # The index is kept up to date from here on, so later calls
+            #   only pay for the objects that moved
+            self._collide = _SpatialHash(1.0)
+            for item in self.items:
+                if item._shape() is not None:
+                    self._collide.insert(item, item._worldBBox())
+        collide = self._collide
+        if len(collide):
+            # Cells about twice the average object size; chosen again when
+            #   that has changed a lot, e.g. if the grid was made empty
+            cellSize = 2.0 * collide.extent / len(collide)
+            if cellSize > 0 and not \
+                    collide.cellSize / COLLIDE_RESIZE <= cellSize <= collide.cellSize * COLLIDE_RESIZE:
+                collide.resize(cellSize)
+        return [(a, b) for a, b in self._collide.pairs() if _shapesIntersect(a._shape(), b._shape())]
+
+    def setVirtual(self, flag=True, cellSize=None):
+        """Turn virtual mode on (or with flag False, off). In virtual mode
+        only objects overlapping the visible part of the world have canvas
+        items; the rest get one as the view is panned or zoomed with
+        setCoords, or as they move into view. cellSize is the world size of
+        the grid used to find visible objects, by default a quarter of the
+        current view."""
+        self.__checkOpen()
+        if flag:
+            if cellSize is None:
+                x1, y1, x2, y2 = self._viewport(0)
+                cellSize = max(x2-x1, y2-y1) / 4.0
+            self._virtual = _SpatialHash(cellSize)
+            self._shown = set()      # indexed items that have canvas items
+            self._unindexed = set()  # items without a known extent
+            self._pixelSized = set()  # indexed items sized in pixels
+            self._drawOrder = {}     # item -> rank, higher drawn later
+            # ranks come from a counter so that undrawing never frees one up
+            self._drawRanks = itertools.count()
+            self._rankItems = {}     # rank -> item
+            self._liveRanks = []     # sorted ranks of items with canvas items
+            self._view = self._viewport()
+            for item in self.items:
+                self._addVirtual(item)
+            self._cull()
+        elif self._virtual is not None:
+            self._virtual = None
+            for item in self.items:
+                if item.id is None:
+                    self._materialize(item)
+                    self._markObject(item)
+            self._restack(self.items)
+        self.__autoflush()
+        return self
+
+    def isVirtual(self):
+        return self._virtual is not None
+
+    def _viewport(self, margin=VIRTUAL_MARGIN):
+        # Internal method returning the visible world area grown by margin
+        #   pixels on every side
+        x1, y1 = self.toWorld(-margin, self.height + margin)
+        x2, y2 = self.toWorld(self.width + margin, -margin)
+        return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+    def _inView(self, item):
+        # Internal method: should item have a canvas item right now?
+        if self._virtual is None:
+            return True
+        bbox = _virtualBox(item)
+        return bbox is None or _overlaps(bbox, self._view)
+
+    def _addVirtual(self, item):
+        rank = self._drawOrder[item] = next(self._drawRanks)
+        self._rankItems[rank] = item
+        if item.id is not None:
+            self._liveRanks.append(rank)  # the highest rank so far
+        bbox = _virtualBox(item)
+        if bbox is None:
+            self._unindexed.add(item)
+        else:
+            self._virtual.insert(item, bbox)
+            if _pixelSized(item):
+                self._pixelSized.add(item)
+            if item.id is not None:
+                self._shown.add(item)
+
+    def _delVirtual(self, item):
+        rank = self._drawOrder.pop(item, None)
+        if rank is not None:
+            del self._rankItems[rank]
+            self._dropRank(rank)
+        self._unindexed.discard(item)
+        self._pixelSized.discard(item)
+        self._shown.discard(item)
+        self._virtual.remove(item)
+
+    def _itemMoved(self, item):
+        # Internal method called after item has moved
+        if self._collide is not None and item in self._collide.boxes:
+            self._collide.update(item, item._worldBBox())
+        if self._virtual is None or item in self._unindexed:
+            return
+        bbox = item._worldBBox()
+        self._virtual.update(item, bbox)
+        visible = _overlaps(bbox, self._view)
+        if visible and item.id is None:
+            self._materialize(item)
+            self._shown.add(item)
+            self._placeItem(item)
+        elif not visible and item.id is not None:
+            self._markObject(item)
+            self._deleteItem(item.id)
+            item.id = None
+            self._shown.discard(item)
+            self._dropRank(self._drawOrder[item])
+
+    def _placeItem(self, item):
+        # Internal method that moves the new canvas item of item to its place
+        #   in the drawing order, next to the nearest item drawn after it
+        #   (or else before it)
+        rank = self._drawOrder[item]
+        live = self._liveRanks
+        i = bisect.bisect_left(live, rank)
+        if i < len(live):
+            self.tag_lower(item.id, self._rankItems[live[i]].id)
+        elif i > 0:
+            self.tag_raise(item.id, self._rankItems[live[i-1]].id)
+        live.insert(i, rank)
+
+    def _dropRank(self, rank):
+        # Internal method: the item of rank no longer has a canvas item
+        live = self._liveRanks
+        i = bisect.bisect_left(live, rank)
+        if i < len(live) and live[i] == rank:
+            del live[i]
+
+    def _instancesChanged(self, definition, moved=False):
+        # Internal method called after every instance of definition in this
+        #   window has been restyled or moved through its tag
+        self.markDirty(0, 0, self.width, self.height)
+        if moved and (self._virtual is not None or self._collide is not None):
+            for item in self.items:
+                if isinstance(item, Instance) and item.definition is definition:
+                    self._itemMoved(item)
+
+    def _cull(self):
+        # Internal method that creates canvas items for the objects that
+        #   have come into view and deletes those of objects that have left
+        self._view = self._viewport()
+        visible = self._virtual.query(self._view)
+        for item in self._shown - visible:
+            self._deleteItem(item.id)
+            item.id = None
+        created = visible - self._shown
+        for item in created:
+            self._materialize(item)
+        self._shown = visible
+        self._liveRanks = sorted(self._drawOrder[item] for item in visible | self._unindexed)
+        if created:
+            self._restack(visible | self._unindexed)
+
+    def _restack(self, items):
+        # Internal method that raises the canvas items of items into drawing
+        #   order with one call into Tk
+        if self._virtual is not None:
+            items = sorted(items, key=self._drawOrder.get)
+        commands = ["{} raise {}".format(self._w, item.id) for item in items if item.id is not None]
+        if commands:
+            self.tk.eval("\n".join(commands))
+
+    def drawMany(self, objects):
+        """Draw every object in objects into this window using a single
+        call into Tk. This is much faster than drawing them one at a time.
+        Returns the objects as a list."""
+        self.__checkOpen()
+        objects = list(objects)
+        for obj in objects:
+            if obj.canvas and not obj.canvas.isClosed():
+                raise GraphicsError(OBJ_ALREADY_DRAWN)
+        pending = []  # (object, Tcl create command) pairs not yet sent
+        try:
+            for obj in objects:
+                obj.canvas = self
+                if not self._inView(obj):
+                    continue
+                spec = obj._drawSpec(self)
+                if spec is None:
+                    # e.g. Entry and Image, drawn by themselves once
+                    #   everything before them is, to keep the stacking order
+                    self._createBatch(pending)
+                    pending = []
+                    self._materialize(obj)
+                    continue
+                kind, coords = spec
+                options = _tclOptions(obj.config)
+                tags = obj._itemTags(self)
+                if tags:
+                    options += " -tags " + _tclQuote(tags)
+                pending.append((obj, "{} create {} {} {}".format(
+                    self._w, kind, " ".join(map(str, coords)), options)))
+            self._createBatch(pending)
+        except Exception:
+            # Leave every object undrawn, so it can be drawn again
+            for obj in objects:
+                if obj.id is not None:
+                    self._deleteItem(obj.id)
+                obj.canvas = None
+                obj.id = None
+            raise
+        for obj in objects:
+            self.addItem(obj)
+            self._markObject(obj)
+        self.__autoflush()
+        return objects
+
+    def _createBatch(self, pending):
+        # Internal method that creates the canvas items of (object, create
+        #   command) pairs with one call into Tk. If a command fails, the
+        #   items made before it are deleted again.
+        if not pending:
+            return
+        script = ["set graphicsIds {}"]
+        script.extend("lappend graphicsIds [{}]".format(command) for obj, command in pending)
+        script.append("set graphicsIds")
+        try:
+            ids = self.tk.splitlist(self.tk.eval("\n".join(script)))
+        except tk.TclError:
+            made = self.tk.splitlist(self.tk.globalgetvar("graphicsIds"))
+            if made:
+                self.delete(*made)
+            raise
+        for (obj, command), itemId in zip(pending, ids):
+            obj.id = int(itemId)
+            if obj._handlers:
+                self._bindItem(obj)
+
+    def undrawMany(self, objects):
+        """Undraw every object in objects that is drawn in this window,
+        removing their canvas items in a single call into Tk"""
+        objects = [obj for obj in objects if obj.canvas is self]
+        if not self.closed:
+            ids = []
+            for obj in objects:
+                if obj.id is None:
+                    continue
+                self._markObject(obj)
+                self._handlerItems.pop(obj.id, None)
+                if self._pool is not None:
+                    self._pool.release(obj.id)
+                else:
+                    ids.append(obj.id)
+            if ids:
+                self.delete(*ids)
+            self._delItems(objects)
+        for obj in objects:
+            if isinstance(obj, Image):
+                Image.imageCache.pop(obj.imageId, None)
+            obj.canvas = None
+            obj.id = None
+        self.__autoflush()
+        return objects
+
+    def fillMany(self, objects, colors):
+        """Set the fill color of every object in objects, updating those
+        drawn in this window with a single call into Tk. colors is one color
+        for them all, a sequence of colors, or an n x 3 array of red, green
+        and blue intensities. Returns the objects as a list."""
+        self.__checkOpen()
+        objects = list(objects)
+        if isinstance(colors, str):
+            colors = [colors] * len(objects)
+        else:
+            colors = _colorList(colors)
+        if len(colors) != len(objects):
+            raise GraphicsError(BAD_OPTION)
+        commands = []
+        for obj, color in zip(objects, colors):
+            shape = obj.definition if isinstance(obj, Instance) else obj
+            option = "outline" if isinstance(shape, Point) else "fill"  # as in setFill
+            if option not in shape.config:
+                obj.setFill(color)  # e.g. an Entry, which colors its own widget
+                continue
+            if obj.canvas is not self or obj.id is None or shape._instanceTag is not None:
+                # Instances (and definitions) share their options, which
+                #   _reconfig sends to every instance by tag
+                obj._reconfig(option, color)
+                continue
+            obj.config[option] = color
+            self._markObject(obj)
+            commands.append("{} itemconfigure {} -{} {}".format(self._w, obj.id, option, _tclQuote(color)))
+        if commands:
+            self.tk.eval("\n".join(commands))
+        self.__autoflush()
+        return objects
+
+    def enablePool(self, maxSize=1000):
+        """Recycle the canvas items of undrawn objects instead of deleting
+        them. At most maxSize hidden items are kept for each shape type."""
+        self.__checkOpen()
+        if self._pool is None:
+            self._pool = _ItemPool(self, maxSize)
+        else:
+            self._pool.maxSize = maxSize
+        return self
+
+    def disablePool(self):
+        """Stop recycling canvas items and delete any hidden pooled items"""
+        if self._pool is not None:
+            self._pool.clear()
+            self._pool = None
+        return self
+
+    def resourceStats(self):
+        """Return a dictionary of what the window is holding on to: objects
+        drawn, canvas items (including pooled ones), photo images and their
+        pixel bytes, Tk event bindings, canvas items with handlers, and an
+        estimate of the total bytes"""
+        if self.closed:
+            return {"items": 0, "canvasItems": 0, "images": 0, "imageBytes": 0,
+                    "bindings": 0, "handlers": 0, "bytes": 0}
+        images = []
+        for item in self.items:
+            if isinstance(item, Image):
+                images.append(item.img)
+            elif isinstance(item, Grid) and item.img is not None:
+                images.extend((item.img, item.cells))
+        imageBytes = sum(_imageBytes(img) for img in images)
+        canvasItems = len(self.find_all())
+        bindings = len(self.bind()) + len(self.master.bind()) + len(self.tag_bind(HANDLER_TAG))
+        return {"items": len(self.items),
+                "canvasItems": canvasItems,
+                "images": len(images),
+                "imageBytes": imageBytes,
+                "bindings": bindings,
+                "handlers": len(self._handlerItems),
+                "bytes": canvasItems * ITEM_BYTES + imageBytes}
+
+    def poolStats(self):
+        """Return a dictionary of item pool statistics, or None if pooling
+        is not enabled"""
+        if self._pool is None:
+            return None
+        return self._pool.stats()
+
+    def _createItem(self, kind, coords, options):
+        # Internal method used by GraphicsObjects to create their canvas
+        #   item, reusing a pooled item of the same kind when possible
+        if self._pool is not None:
+            return self._pool.acquire(kind, coords, options)
+        return self._create(kind, tuple(coords) + (options,), {})
+
+    def _deleteItem(self, itemId):
+        # Internal method used by GraphicsObjects to remove their canvas item
+        self._handlerItems.pop(itemId, None)
+        if self._pool is not None:
+            self._pool.release(itemId)
+        else:
+            self.delete(itemId)
+
+    def _materialize(self, item):
+        # Internal method that creates the canvas item for a drawn object
+        item.id = item._draw(self, item.config)
+        if item._handlers:
+            self._bindItem(item)
+        return item.id
+
+    def _bindItem(self, item):
+        # Internal method that routes enter/leave/click events on the
+        #   canvas item of item to its handlers
+        self.addtag_withtag(HANDLER_TAG, item.id)
+        self._handlerItems[item.id] = item
 
     def redraw(self):
-        for item in self.items[:]:
-            item.undraw()
-            item.draw(self)
+        if self._virtual is not None:
+            # only the items that currently exist need projecting again
+            for item in self._shown | self._unindexed:
+                self._deleteItem(item.id)
+                item.id = None
+            self._shown = set()
+            for item in self._unindexed:
+                self._materialize(item)
+            # Texts and Images keep their size in pixels, so their world
+            #   boxes have changed with the coordinates
+            for item in self._pixelSized:
+                self._virtual.update(item, item._worldBBox())
+            self._cull()
+            self._restack(self._shown | self._unindexed)
+        else:
+            for item in self.items[:]:
+                item.undraw()
+                item.draw(self)
+        self.markDirty(0, 0, self.width, self.height)
         self.update()
 
+    def trackDirty(self, flag=True):
+        """Start (or with flag False, stop) recording the screen rectangles
+        changed by drawing, undrawing, moving and reconfiguring objects"""
+        self._dirty = [] if flag else None
+        return self
+
+    def markDirty(self, x1, y1, x2, y2):
+        """Record the screen rectangle (x1,y1)-(x2,y2) as changed. Does
+        nothing unless dirty tracking is on."""
+        dirty = self._dirty
+        if dirty is None:
+            return
+        x1, x2 = max(min(x1, x2), 0), min(max(x1, x2), self.width)
+        y1, y2 = max(min(y1, y2), 0), min(max(y1, y2), self.height)
+        if x1 >= x2 or y1 >= y2:
+            return
+        if len(dirty) >= MAX_DIRTY_RECTS:
+            # too fragmented to be worth tracking separately
+            for r in dirty:
+                x1, y1, x2, y2 = min(x1, r[0]), min(y1, r[1]), max(x2, r[2]), max(y2, r[3])
+            del dirty[:]
+        merged = True
+        while merged:
+            merged = False
+            for r in dirty:
+                if r[0] <= x2 and x1 <= r[2] and r[1] <= y2 and y1 <= r[3]:
+                    dirty.remove(r)
+                    x1, y1, x2, y2 = min(x1, r[0]), min(y1, r[1]), max(x2, r[2]), max(y2, r[3])
+                    merged = True
+                    break
+        dirty.append((x1, y1, x2, y2))
+
+    def getDirtyRects(self):
+        """Return a list of (x1, y1, x2, y2) screen rectangles changed since
+        the last call to clearDirty"""
+        if self._dirty is None:
+            return []
+        return list(self._dirty)
+
+    def clearDirty(self):
+        """Forget the changed rectangles, e.g. once a frame has been exported.
+        Returns the rectangles that were cleared."""
+        rects = self.getDirtyRects()
+        if self._dirty is not None:
+            self._dirty = []
+        return rects
+
+    def _markObject(self, item):
+        # Internal method that marks the screen area covered by item as dirty
+        if self._dirty is not None:
+            bbox = item._screenBBox(self)
+            if bbox:
+                self.markDirty(*bbox)
+
     def containsPoint(self, p):
         if p is None:
             return
         x = p.getX()
         y = p.getY()
         return 0 <= x <= self.width and 0 <= y <= self.height
+
+    def save(self, filename):
+        """Saves the window contents to filename as SVG if its name ends
+        in .svg, otherwise as encapsulated PostScript"""
+        self.__checkOpen()
+        if filename.lower().endswith(".svg"):
+            return self.saveSVG(filename)
+        self.update_idletasks()
+        self.postscript(file=filename, colormode="color", x=0, y=0,
+                        width=self.width, height=self.height)
+
+    def saveSVG(self, filename):
+        """Saves the window contents to filename as SVG. Objects are written
+        one at a time straight from their geometry and options, so this
+        stays fast for very large scenes. Tk turns color names into RGB for
+        the file, so like the rest of the window this needs a display."""
+        self.__checkOpen()
+        with open(filename, "w") as f:
+            f.write('<svg xmlns="http://www.w3.org/2000/svg" '
+                    'xmlns:xlink="http://www.w3.org/1999/xlink" '
+                    'width="{0}" height="{1}" viewBox="0 0 {0} {1}">\n'.format(self.width, self.height))
+            f.write('<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" '
+                    'markerWidth="4" markerHeight="4" orient="auto-start-reverse">'
+                    '<path d="M0,0 L10,5 L0,10 z" fill="context-stroke"/></marker></defs>\n')
+            f.write('<rect width="100%" height="100%" fill={}/>\n'.format(
+                quoteattr(_svgColor(self.cget("bg")))))
+            for item in self.items:
+                element = item._svg(self)
+                if element:
+                    f.write(element)
+                    f.write("\n")
+            f.write("</svg>\n")
+
+    def saveScene(self, filename):
+        """Saves every object drawn in the window, in drawing order, and the
+        window's coordinates to filename in a compact binary format. Objects
+        of subclasses are saved as the graphics class they extend."""
+        coords = None
+        trans = self.trans
+        if trans:
+            coords = [trans.xbase, trans.ybase - trans.yscale*(self.height-1),
+                      trans.xbase + trans.xscale*(self.width-1), trans.ybase]
+        # Check everything can be saved before the file is touched
+        for obj in self.items:
+            _sceneType(obj)
+            if isinstance(obj, Instance):
+                _sceneType(obj.definition)
+        with open(filename, "wb") as f:
+            _writeScene(f, self.items, {"coords": coords})
+
+    def loadScene(self, filename):
+        """Draws the objects saved in filename by saveScene into the window,
+        in their saved stacking order, setting its coordinates to those
+        saved with the scene. Returns the list of objects."""
+        self.__checkOpen()
+        loaded = []
+        with open(filename, "rb") as f:
+            header, objects = _readScene(f)
+            if header.get("coords"):
+                self.setCoords(*header["coords"])
+            batch = []
+            for obj in objects:
+                batch.append(obj)
+                if len(batch) == SCENE_BATCH:
+                    loaded.extend(self.drawMany(batch))
+                    batch = []
+            loaded.extend(self.drawMany(batch))
+        return loaded
         
                       
+class _ItemPool:
+
+    """Internal class holding hidden canvas items for reuse by a GraphWin"""
+
+    def __init__(self, canvas, maxSize):
+        self.canvas = canvas
+        self.maxSize = maxSize
+        self.free = {}   # shape type -> list of hidden item ids
+        self.kinds = {}  # item id -> shape type, for items created by the pool
+        self.hits = 0
+        self.misses = 0
+        self.recycled = 0
+        self.discarded = 0
+
+    def acquire(self, kind, coords, options):
+        # Items are pooled by canvas type and option names, so a reused item
+        #   never carries over an option its new owner doesn't set
+        key = (kind, tuple(sorted(options)))
+        free = self.free.get(key)
+        canvas = self.canvas
+        if free:
+            itemId = free.pop()
+            canvas.coords(itemId, *coords)
+            options = dict(options)
+            options["state"] = "normal"
+            options.setdefault("tags", "")
+            canvas.itemconfig(itemId, options)
+            canvas.tag_raise(itemId)
+            self.hits += 1
+        else:
+            itemId = canvas._create(kind, tuple(coords) + (options,), {})
+            self.kinds[itemId] = key
+            self.misses += 1
+        return itemId
+
+    def release(self, itemId):
+        key = self.kinds.get(itemId)
+        if key is None:  # created before pooling was enabled
+            self.canvas.delete(itemId)
+            return
+        free = self.free.setdefault(key, [])
+        if len(free) < self.maxSize:
+            self.canvas.itemconfig(itemId, state="hidden")
+            free.append(itemId)
+            self.recycled += 1
+        else:
+            self.canvas.delete(itemId)
+            del self.kinds[itemId]
+            self.discarded += 1
+
+    def clear(self):
+        for free in self.free.values():
+            for itemId in free:
+                del self.kinds[itemId]
+            if free and not self.canvas.isClosed():
+                self.canvas.delete(*free)
+        self.free = {}
+
+    def stats(self):
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "recycled": self.recycled,
+                "discarded": self.discarded,
+                "free": sum(len(free) for free in self.free.values()),
+                "maxSize": self.maxSize}
+
+
+class _SpatialHash:
+
+    """Internal uniform grid over world coordinates, mapping each cell to
+    the objects whose bounding boxes overlap it"""
+
+    def __init__(self, cellSize):
+        self.cellSize = float(cellSize)
+        self.cells = {}     # (column, row) -> set of objects
+        self.boxes = {}     # object -> (bounding box, cell range)
+        self.large = set()  # objects covering too many cells to list
+        self.extent = 0.0   # total of the larger side of every box
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def resize(self, cellSize):
+        """Re-grid every object with cells of the new size"""
+        boxes = [(obj, entry[0]) for obj, entry in self.boxes.items()]
+        self.cellSize = float(cellSize)
+        self.cells = {}
+        self.boxes = {}
+        self.large = set()
+        self.extent = 0.0
+        for obj, bbox in boxes:
+            self.insert(obj, bbox)
+
+    def _range(self, bbox):
+        size = self.cellSize
+        return (int(floor(bbox[0] / size)), int(floor(bbox[1] / size)),
+                int(floor(bbox[2] / size)), int(floor(bbox[3] / size)))
+
+    def insert(self, obj, bbox):
+        r = self._range(bbox)
+        self.boxes[obj] = (bbox, r)
+        self.extent += _extent(bbox)
+        if (r[2]-r[0]+1) * (r[3]-r[1]+1) > SPATIAL_HASH_MAX_CELLS:
+            self.large.add(obj)
+            return
+        cells = self.cells
+        for i in range(r[0], r[2]+1):
+            for j in range(r[1], r[3]+1):
+                cell = cells.get((i, j))
+                if cell is None:
+                    cells[(i, j)] = cell = set()
+                cell.add(obj)
+
+    def remove(self, obj):
+        entry = self.boxes.pop(obj, None)
+        if entry is None:
+            return
+        self.extent -= _extent(entry[0])
+        if obj in self.large:
+            self.large.discard(obj)
+            return
+        r = entry[1]
+        cells = self.cells
+        for i in range(r[0], r[2]+1):
+            for j in range(r[1], r[3]+1):
+                cell = cells[(i, j)]
+                cell.discard(obj)
+                if not cell:
+                    del cells[(i, j)]
+
+    def update(self, obj, bbox):
+        entry = self.boxes.get(obj)
+        if entry is not None and obj not in self.large and entry[1] == self._range(bbox):
+            self.boxes[obj] = (bbox, entry[1])  # still in the same cells
+            self.extent += _extent(bbox) - _extent(entry[0])
+        else:
+            self.remove(obj)
+            self.insert(obj, bbox)
+
+    def pairs(self):
+        """Returns the set of pairs of objects whose bounding boxes overlap"""
+        found = set()
+        boxes = self.boxes
+        for cell in self.cells.values():
+            if len(cell) < 2:
+                continue
+            cell = list(cell)
+            for i, a in enumerate(cell):
+                box = boxes[a][0]
+                for b in cell[i+1:]:
+                    if _overlaps(box, boxes[b][0]):
+                        found.add((a, b) if id(a) < id(b) else (b, a))
+        for a in self.large:
+            for b in self.query(boxes[a][0]):
+                if b is not a:
+                    found.add((a, b) if id(a) < id(b) else (b, a))
+        return found
+
+    def query(self, bbox):
+        """Returns the set of objects whose bounding boxes overlap bbox"""
+        r = self._range(bbox)
+        cells = self.cells
+        candidates = set(self.large)
+        if (r[2]-r[0]+1) * (r[3]-r[1]+1) > len(cells):
+            for (i, j), cell in cells.items():
+                if r[0] <= i <= r[2] and r[1] <= j <= r[3]:
+                    candidates.update(cell)
+        else:
+            for i in range(r[0], r[2]+1):
+                for j in range(r[1], r[3]+1):
+                    cell = cells.get((i, j))
+                    if cell:
+                        candidates.update(cell)
+        boxes = self.boxes
+        return set(obj for obj in candidates if _overlaps(boxes[obj][0], bbox))
+
+
+def _virtualBox(item):
+    # The world box a virtual GraphWin indexes item by, or None to keep it
+    #   drawn all the time. Entries are never culled, as each new canvas
+    #   item for one would make a new widget and take the keyboard focus.
+    if isinstance(item, Entry):
+        return None
+    return item._worldBBox()
+
+
+def _pixelSized(item):
+    # Is item's world box measured in pixels, so changing with the
+    #   window's coordinates?
+    if isinstance(item, Instance):
+        item = item.definition
+    return isinstance(item, (Text, Image))
+
+
+def _extent(bbox):
+    # The larger side of a bounding box
+    return max(bbox[2] - bbox[0], bbox[3] - bbox[1])
+
+
+def _toScreenArray(canvas, xy):
+    # Vectorized GraphWin.toScreen for an n x 2 array of world points,
+    #   without the rounding to whole pixels
+    trans = canvas.trans
+    if not trans:
+        return np.asarray(xy, dtype=float)
+    screen = np.empty((len(xy), 2))
+    screen[:, 0] = (xy[:, 0] - trans.xbase) / trans.xscale
+    screen[:, 1] = (trans.ybase - xy[:, 1]) / trans.yscale
+    return screen
+
+
+def _simplify(xy, tolerance, closed=False):
+    # Douglas-Peucker simplification of the polyline xy (an n x 2 array).
+    #   Returns the sorted indices of the vertices kept; a closed polyline
+    #   is treated as returning to its first vertex.
+    if closed:
+        xy = np.vstack((xy, xy[:1]))
+    n = len(xy)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n-1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a = xy[first]
+        dx, dy = xy[last] - a
+        inner = xy[first+1:last] - a
+        length = sqrt(dx*dx + dy*dy)
+        if length:
+            dist = np.abs(dx * inner[:, 1] - dy * inner[:, 0]) / length
+        else:
+            dist = np.hypot(inner[:, 0], inner[:, 1])
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            i += first + 1
+            keep[i] = True
+            stack.append((first, i))
+            stack.append((i, last))
+    if closed:
+        keep = keep[:-1]
+    return np.nonzero(keep)[0]
+
+
+def _shapesIntersect(a, b):
+    # Exact intersection test for two outlines as returned by _shape. Two
+    #   ellipses are tested with b approximated by an ELLIPSE_SIDES-gon.
+    if b[0] == "ellipse" and a[0] != "ellipse":
+        a, b = b, a
+    if a[0] != "ellipse":
+        return _polylinesIntersect(a[1], a[0] == "poly", b[1], b[0] == "poly")
+    kind, cx, cy, rx, ry = a
+    if b[0] == "ellipse":
+        if rx == ry and b[3] == b[4]:  # two circles
+            return sqrt((cx-b[1]) ** 2 + (cy-b[2]) ** 2) <= rx + b[3]
+        b = ("poly", _ellipsePoints(*b[1:]))
+    if not rx or not ry:  # a flat oval is just a segment
+        a = ("segment", [(cx-rx, cy-ry), (cx+rx, cy+ry)])
+        return _polylinesIntersect(a[1], False, b[1], b[0] == "poly")
+    # Scale space so that a becomes the unit circle around the origin;
+    #   b's edges stay straight
+    points = [((x-cx) / rx, (y-cy) / ry) for x, y in b[1]]
+    closed = b[0] == "poly"
+    if closed and _pointInPolygon(0.0, 0.0, points):
+        return True
+    for (x1, y1), (x2, y2) in _edges(points, closed):
+        if _segmentDistance(0.0, 0.0, x1, y1, x2, y2) <= 1.0:
+            return True
+    return False
+
+
+def _ellipsePoints(cx, cy, rx, ry):
+    step = 2 * pi / ELLIPSE_SIDES
+    return [(float(cx + rx*cos(i*step)), float(cy + ry*sin(i*step))) for i in range(ELLIPSE_SIDES)]
+
+
+def _edges(points, closed):
+    edges = list(zip(points, points[1:]))
+    if closed and len(points) > 2:
+        edges.append((points[-1], points[0]))
+    return edges or [(points[0], points[0])]
+
+
+def _polylinesIntersect(a, aClosed, b, bClosed):
+    bEdges = _edges(b, bClosed)
+    for p1, p2 in _edges(a, aClosed):
+        for q1, q2 in bEdges:
+            if _segmentsIntersect(p1, p2, q1, q2):
+                return True
+    # No edges cross, so one can only be entirely inside the other
+    if aClosed and _pointInPolygon(b[0][0], b[0][1], a):
+        return True
+    return bClosed and _pointInPolygon(a[0][0], a[0][1], b)
+
+
+def _orientation(p, q, r):
+    # float() so numpy scalar coordinates don't give numpy booleans
+    value = float((q[0]-p[0]) * (r[1]-p[1]) - (q[1]-p[1]) * (r[0]-p[0]))
+    return (value > 0) - (value < 0)
+
+
+def _onSegment(p, q, r):
+    # Is r, known to be collinear with p and q, between them?
+    return min(p[0], q[0]) <= r[0] <= max(p[0], q[0]) and min(p[1], q[1]) <= r[1] <= max(p[1], q[1])
+
+
+def _segmentsIntersect(p1, p2, q1, q2):
+    o1 = _orientation(p1, p2, q1)
+    o2 = _orientation(p1, p2, q2)
+    o3 = _orientation(q1, q2, p1)
+    o4 = _orientation(q1, q2, p2)
+    if o1 != o2 and o3 != o4:
+        return True
+    return (o1 == 0 and _onSegment(p1, p2, q1)) or (o2 == 0 and _onSegment(p1, p2, q2)) \
+        or (o3 == 0 and _onSegment(q1, q2, p1)) or (o4 == 0 and _onSegment(q1, q2, p2))
+
+
+def _segmentDistance(px, py, x1, y1, x2, y2):
+    # Distance from (px, py) to the segment (x1, y1)-(x2, y2)
+    dx, dy = x2-x1, y2-y1
+    length = dx*dx + dy*dy
+    t = 0.0
+    if length:
+        t = max(0.0, min(1.0, ((px-x1)*dx + (py-y1)*dy) / length))
+    return sqrt((x1 + t*dx - px) ** 2 + (y1 + t*dy - py) ** 2)
+
+
+def _pointInPolygon(x, y, points):
+    # Even-odd rule
+    inside = False
+    j = len(points) - 1
+    for i in range(len(points)):
+        xi, yi = points[i]
+        xj, yj = points[j]
+        if (yi > y) != (yj > y) and x < (xj-xi) * (y-yi) / (yj-yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _overlaps(a, b):
+    # Do the (x1, y1, x2, y2) boxes a and b overlap?
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
 class Transform:
 
     """Internal class for 2-D coordinate transformations"""
@@ -334,8 +1647,14 @@ DEFAULT_CONFIG = {"fill": "",
 class GraphicsObject:
 
     """Generic base class for all of the drawable objects"""
-    # A subclass of GraphicsObject should override _draw and
-    #   and _move methods.
+    # A subclass of GraphicsObject should override _drawSpec (or _draw,
+    #   for items that need more than coordinates and options) and
+    #   _move methods.
+
+    # Once an Instance of an object is made, the canvas tag given to all of
+    #   its instances' items and the windows they have been drawn in
+    _instanceTag = None
+    _instanceWins = None
     
     def __init__(self, options):
         # options is a list of strings indicating which options are
@@ -346,6 +1665,7 @@ class GraphicsObject:
         #    drawn shape.
         self.canvas = None
         self.id = None
+        self._handlers = None  # "enter", "leave" or "click" -> function
 
         # config is the dictionary of configuration options for the widget.
         config = {}
@@ -368,6 +1688,32 @@ class GraphicsObject:
         self._reconfig("width", width)
         return self
 
+    def onEnter(self, func):
+        """Call func with the pointer position (a Point) whenever the
+        pointer moves onto the object"""
+        return self._setHandler("enter", func)
+
+    def onLeave(self, func):
+        """Call func with the pointer position (a Point) whenever the
+        pointer moves off the object"""
+        return self._setHandler("leave", func)
+
+    def onClick(self, func):
+        """Call func with the click position (a Point) whenever the object
+        is clicked with the left mouse button"""
+        return self._setHandler("click", func)
+
+    def _setHandler(self, kind, func):
+        # Handlers are dispatched by Tk through the canvas item's tags, so
+        #   an object costs nothing while the pointer isn't crossing it
+        if self._handlers is None:
+            self._handlers = {}
+        self._handlers[kind] = func
+        canvas = self.canvas
+        if canvas and not canvas.isClosed() and self.id is not None:
+            canvas._bindItem(self)
+        return self
+
     def draw(self, graphwin):
 
         """Draw the object in graphwin, which should be a GraphWin
@@ -380,9 +1726,11 @@ class GraphicsObject:
         if graphwin.isClosed():
             raise GraphicsError("Can't draw to closed window")
         self.canvas = graphwin
-        self.id = self._draw(graphwin, self.config)
+        if graphwin._inView(self):
+            graphwin._materialize(self)
         graphwin.addItem(self)
-        if graphwin.autoflush:
+        graphwin._markObject(self)
+        if graphwin.autoflush and not _deferFlush:
             _root.update()
         return self
 
@@ -394,9 +1742,11 @@ class GraphicsObject:
         if not self.canvas:
             return
         if not self.canvas.isClosed():
-            self.canvas.delete(self.id)
+            if self.id is not None:
+                self.canvas._markObject(self)
+                self.canvas._deleteItem(self.id)
             self.canvas.delItem(self)
-            if self.canvas.autoflush:
+            if self.canvas.autoflush and not _deferFlush:
                 _root.update()
         self.canvas = None
         self.id = None
@@ -407,18 +1757,25 @@ class GraphicsObject:
         """move object dx units in x direction and dy units in y
         direction"""
         
-        self._move(dx, dy)
         canvas = self.canvas
         if canvas and not canvas.isClosed():
-            trans = canvas.trans
-            if trans:
-                x = dx / trans.xscale
-                y = -dy / trans.yscale
-            else:
-                x = dx
-                y = dy
-            self.canvas.move(self.id, x, y)
-            if canvas.autoflush:
+            canvas._markObject(self)
+        self._move(dx, dy)
+        if canvas and not canvas.isClosed():
+            if self.id is not None:
+                self.canvas.move(self.id, *_screenDelta(canvas, dx, dy))
+            canvas._itemMoved(self)
+            canvas._markObject(self)
+            if canvas.autoflush and not _deferFlush:
+                _root.update()
+        if self._instanceTag is not None:
+            # Instances share this object's geometry, so they all move too
+            flush = False
+            for win in self._instanceWindows():
+                win.move(self._instanceTag, *_screenDelta(win, dx, dy))
+                win._instancesChanged(self, True)
+                flush = flush or win.autoflush
+            if flush and not _deferFlush:
                 _root.update()
         return self
            
@@ -430,20 +1787,90 @@ class GraphicsObject:
             raise GraphicsError(UNSUPPORTED_METHOD)
         options = self.config
         options[option] = setting
-        if self.canvas and not self.canvas.isClosed():
+        if self.canvas and not self.canvas.isClosed() and self.id is not None:
+            self.canvas._markObject(self)
             self.canvas.itemconfig(self.id, options)
-            if self.canvas.autoflush:
+            self.canvas._markObject(self)
+            if self.canvas.autoflush and not _deferFlush:
+                _root.update()
+        resized = option in ("text", "font")  # text takes up a new area
+        if resized and self.canvas and not self.canvas.isClosed():
+            self.canvas._itemMoved(self)
+        if self._instanceTag is not None:
+            # One call per window restyles every instance drawn there
+            flush = False
+            for win in self._instanceWindows():
+                win.itemconfig(self._instanceTag, {option: setting})
+                win._instancesChanged(self, resized)
+                flush = flush or win.autoflush
+            if flush and not _deferFlush:
                 _root.update()
 
+    def _instanceWindows(self):
+        # Open windows in which instances of this object have been drawn
+        return [win for win in list(self._instanceWins) if not win.isClosed()]
+
+    def _itemTags(self, canvas):
+        """Returns the tag to give the object's canvas item, or None"""
+        return None
+
     def _draw(self, canvas, options):
         """draws appropriate figure on canvas with options provided
         Returns Tk id of item drawn"""
-        pass  # must override in subclass
+        kind, coords = self._drawSpec(canvas)
+        return canvas._createItem(kind, coords, options)
+
+    def _drawSpec(self, canvas):
+        """Returns the canvas item type and screen coordinates of the
+        figure, or None if it can't be drawn from those alone"""
+        return None  # override in subclass, or override _draw
+
+    def _svg(self, canvas):
+        """Returns the object as an SVG element, or None if it can't be
+        written as one"""
+        spec = self._drawSpec(canvas)
+        if spec is None:
+            return None
+        return _svgElement(spec[0], spec[1], self.config)
 
     def _move(self, dx, dy):
         """updates internal state of object to move it dx,dy units"""
         pass  # must override in subclass
 
+    def _screenBBox(self, canvas):
+        """Returns the (x1, y1, x2, y2) screen area covered by the object,
+        or None if it has no canvas item"""
+        # Subclasses that know their geometry override this to avoid
+        #   asking Tk for the item's bounding box
+        if self.id is None:
+            return None
+        return canvas.bbox(self.id)
+
+    def _worldBBox(self):
+        """Returns the (x1, y1, x2, y2) world area covered by the object,
+        with x1 <= x2 and y1 <= y2, or None if it isn't known"""
+        return None
+
+    def _shape(self):
+        """Returns the outline of the object for intersection tests: a
+        ("poly", points), ("segment", points) or ("ellipse", cx, cy, rx, ry)
+        tuple in world coordinates, or None if it has no outline"""
+        return None
+
+    def intersects(self, other):
+        """Returns True if this object and other overlap. Both must be
+        Rectangles, Ovals, Circles, Lines, Polygons or Points."""
+        a, b = self._shape(), other._shape()
+        if a is None or b is None:
+            raise GraphicsError(UNSUPPORTED_METHOD)
+        if not _overlaps(self._worldBBox(), other._worldBBox()):
+            return False
+        return _shapesIntersect(a, b)
+
+    def _pad(self):
+        # Half the line weight, rounded up, for growing bounding boxes
+        return int(float(self.config.get("width", 1)) / 2) + 1
+
          
 class Point(GraphicsObject):
     def __init__(self, x, y):
@@ -455,13 +1882,32 @@ class Point(GraphicsObject):
     def __repr__(self):
         return "Point({}, {})".format(self.x, self.y)
         
-    def _draw(self, canvas, options):
+    def _drawSpec(self, canvas):
         x, y = canvas.toScreen(self.x, self.y)
-        return canvas.create_rectangle(x, y, x+1, y+1, options)
+        return "rectangle", (x, y, x+1, y+1)
         
     def _move(self, dx, dy):
         self.x = self.x + dx
         self.y = self.y + dy
+
+    def _screenBBox(self, canvas):
+        x, y = canvas.toScreen(self.x, self.y)
+        return x, y, x+2, y+2
+
+    def _worldBBox(self):
+        return self.x, self.y, self.x, self.y
+
+    def _sceneState(self):
+        return (self.x, self.y), None, b""
+
+    @classmethod
+    def _fromScene(cls, geometry, config, extra, blob):
+        p = _scenePoint(*geometry)
+        p.config = config
+        return p
+
+    def _shape(self):
+        return "segment", [(self.x, self.y), (self.x, self.y)]
         
     def clone(self):
         other = Point(self.x, self.y)
@@ -530,6 +1976,31 @@ class _BBox(GraphicsObject):
         self.p2.x = self.p2.x + dx
         self.p2.y = self.p2.y + dy
                 
+    def _screenBBox(self, canvas):
+        x1, y1 = canvas.toScreen(self.p1.x, self.p1.y)
+        x2, y2 = canvas.toScreen(self.p2.x, self.p2.y)
+        pad = self._pad()
+        if self.config.get("arrow", "none") != "none":
+            pad = pad + 10  # room for the default arrowhead
+        return min(x1, x2)-pad, min(y1, y2)-pad, max(x1, x2)+pad, max(y1, y2)+pad
+
+    def _worldBBox(self):
+        p1, p2 = self.p1, self.p2
+        return min(p1.x, p2.x), min(p1.y, p2.y), max(p1.x, p2.x), max(p1.y, p2.y)
+
+    def _sceneState(self):
+        return (self.p1.x, self.p1.y, self.p2.x, self.p2.y), None, b""
+
+    @classmethod
+    def _fromScene(cls, geometry, config, extra, blob):
+        # Rectangle, Oval and Line
+        obj = _bare(cls, config)
+        obj.p1 = _scenePoint(geometry[0], geometry[1])
+        obj.p2 = _scenePoint(geometry[2], geometry[3])
+        if "arrow" in config:
+            obj.setOutline = obj.setFill
+        return obj
+
     def getP1(self): return self.p1.clone()
 
     def getP2(self): return self.p2.clone()
@@ -561,13 +2032,17 @@ class Rectangle(_BBox):
     def __repr__(self):
         return "Rectangle({}, {})".format(str(self.p1), str(self.p2))
     
-    def _draw(self, canvas, options):
+    def _drawSpec(self, canvas):
         p1 = self.p1
         p2 = self.p2
         x1, y1 = canvas.toScreen(p1.x, p1.y)
         x2, y2 = canvas.toScreen(p2.x, p2.y)
-        return canvas.create_rectangle(x1, y1, x2, y2, options)
-        
+        return "rectangle", (x1, y1, x2, y2)
+
+    def _shape(self):
+        p1, p2 = self.p1, self.p2
+        return "poly", [(p1.x, p1.y), (p2.x, p1.y), (p2.x, p2.y), (p1.x, p2.y)]
+
     def clone(self):
         other = Rectangle(self.p1, self.p2)
         other.config = self.config.copy()
@@ -594,12 +2069,16 @@ class Oval(_BBox):
         other.config = self.config.copy()
         return other
    
-    def _draw(self, canvas, options):
+    def _drawSpec(self, canvas):
         p1 = self.p1
         p2 = self.p2
         x1, y1 = canvas.toScreen(p1.x, p1.y)
         x2, y2 = canvas.toScreen(p2.x, p2.y)
-        return canvas.create_oval(x1, y1, x2, y2, options)
+        return "oval", (x1, y1, x2, y2)
+
+    def _shape(self):
+        p1, p2 = self.p1, self.p2
+        return "ellipse", (p1.x+p2.x)/2.0, (p1.y+p2.y)/2.0, abs(p2.x-p1.x)/2.0, abs(p2.y-p1.y)/2.0
 
 
 class Circle(Oval):
@@ -628,6 +2107,23 @@ class Circle(Oval):
     def getRadius(self):
         return self.radius
 
+    def _shape(self):
+        p1, p2 = self.p1, self.p2
+        return "ellipse", (p1.x+p2.x)/2.0, (p1.y+p2.y)/2.0, self.radius, self.radius
+
+    def _sceneState(self):
+        c = self.getCenter()
+        return (c.x, c.y, self.radius), None, b""
+
+    @classmethod
+    def _fromScene(cls, geometry, config, extra, blob):
+        x, y, r = geometry
+        obj = _bare(cls, config)
+        obj.p1 = _scenePoint(x-r, y-r)
+        obj.p2 = _scenePoint(x+r, y+r)
+        obj.radius = r
+        return obj
+
     def containsPoint(self, p):
         if p is None:
             return
@@ -661,13 +2157,16 @@ class Line(_BBox):
         other.config = self.config.copy()
         return other
   
-    def _draw(self, canvas, options):
+    def _drawSpec(self, canvas):
         p1 = self.p1
         p2 = self.p2
         x1, y1 = canvas.toScreen(p1.x, p1.y)
         x2, y2 = canvas.toScreen(p2.x, p2.y)
-        return canvas.create_line(x1, y1, x2, y2, options)
+        return "line", (x1, y1, x2, y2)
         
+    def _shape(self):
+        return "segment", [(self.p1.x, self.p1.y), (self.p2.x, self.p2.y)]
+
     def setArrow(self, option):
         if option not in ["first", "last", "both", "none"]:
             raise GraphicsError(BAD_OPTION)
@@ -689,6 +2188,9 @@ class Polygon(GraphicsObject):
         if len(points) == 1 and type(points[0]) == type([]):
             points = points[0]
         self.points = list(map(Point.clone, points))
+        self._xy = None  # vertices as an n x 2 array, made when needed
+        self._lod = collections.OrderedDict()  # zoom -> indices of kept vertices
+        self.lodCounts = None  # (vertices, vertices drawn) at the last draw
         GraphicsObject.__init__(self, ["outline", "width", "fill"])
         for key in kwargs:
             if key == "fill":
@@ -712,15 +2214,74 @@ class Polygon(GraphicsObject):
     def _move(self, dx, dy):
         for p in self.points:
             p.move(dx, dy)
-   
-    def _draw(self, canvas, options):
-        args = [canvas]
+        if self._xy is not None:
+            self._xy += (dx, dy)
+
+    def getVertexCounts(self):
+        """Returns (vertices, vertices drawn) for the last time the polygon
+        was drawn, or None if it hasn't been"""
+        return self.lodCounts
+
+    def _screenBBox(self, canvas):
+        xs, ys = [], []
         for p in self.points:
             x, y = canvas.toScreen(p.x, p.y)
-            args.append(x)
-            args.append(y)
-        args.append(options)
-        return GraphWin.create_polygon(*args)
+            xs.append(x)
+            ys.append(y)
+        pad = self._pad()
+        return min(xs)-pad, min(ys)-pad, max(xs)+pad, max(ys)+pad
+
+    def _worldBBox(self):
+        xs = [p.x for p in self.points]
+        ys = [p.y for p in self.points]
+        return min(xs), min(ys), max(xs), max(ys)
+   
+    def _drawSpec(self, canvas):
+        n = len(self.points)
+        tolerance = canvas.lodTolerance
+        if not tolerance or n < LOD_MIN_VERTICES:
+            coords = []
+            for p in self.points:
+                x, y = canvas.toScreen(p.x, p.y)
+                coords.append(x)
+                coords.append(y)
+            self.lodCounts = (n, n)
+            return "polygon", coords
+        if self._xy is None:
+            self._xy = np.array([(p.x, p.y) for p in self.points], dtype=float)
+        screen = _toScreenArray(canvas, self._xy)
+        # Which vertices survive depends only on the zoom, not the position
+        trans = canvas.trans
+        zoom = (trans.xscale, trans.yscale, tolerance) if trans else (1, 1, tolerance)
+        keep = self._lod.get(zoom)
+        if keep is None:
+            keep = _simplify(screen, tolerance, closed=True)
+            if len(keep) < 3:  # Tk polygons need three vertices
+                keep = np.array([0, n // 3, 2 * n // 3])
+            self._lod[zoom] = keep
+            if len(self._lod) > LOD_CACHE_SIZE:
+                self._lod.popitem(last=False)
+        self.lodCounts = (n, len(keep))
+        return "polygon", np.floor(screen[keep] + 0.5).astype(int).ravel().tolist()
+
+    def _shape(self):
+        return "poly", [(p.x, p.y) for p in self.points]
+
+    def _sceneState(self):
+        geometry = []
+        for p in self.points:
+            geometry.append(p.x)
+            geometry.append(p.y)
+        return geometry, None, b""
+
+    @classmethod
+    def _fromScene(cls, geometry, config, extra, blob):
+        obj = _bare(cls, config)
+        obj.points = [_scenePoint(geometry[i], geometry[i+1]) for i in range(0, len(geometry), 2)]
+        obj._xy = None
+        obj._lod = collections.OrderedDict()
+        obj.lodCounts = None
+        return obj
 
     def containsPoint(self, p):
         if p is None:
@@ -734,6 +2295,392 @@ class Polygon(GraphicsObject):
         return polygon.contains_point((p.x, p.y))
 
 
+class LineChart(_BBox):
+
+    """A live line chart of the last capacity samples, filling the area
+    between p1 and p2 with the newest sample at the right. Samples are kept
+    in a ring buffer and drawn as a single canvas line."""
+
+    def __init__(self, p1, p2, capacity=1000, **kwargs):
+        _BBox.__init__(self, p1, p2, ["fill", "width"])
+        self.setFill(DEFAULT_CONFIG['outline'])
+        self.setOutline = self.setFill
+        self.capacity = capacity
+        self.samples = np.zeros(capacity)  # ring buffer
+        self.start = 0  # index of the oldest sample
+        self.count = 0
+        self.range = None  # fixed (low, high) values, or None to fit the data
+        for key in kwargs:
+            if key == "fill":
+                self.setFill(kwargs[key])
+            elif key == "outline":
+                self.setOutline(kwargs[key])
+            elif key == "width":
+                self.setWidth(kwargs[key])
+            elif key == "range":
+                self.setRange(*kwargs[key])
+
+    def __repr__(self):
+        return "LineChart({}, {}, {})".format(self.p1, self.p2, self.capacity)
+
+    def clone(self):
+        other = LineChart(self.p1, self.p2, self.capacity)
+        other.config = self.config.copy()
+        other.samples = self.samples.copy()
+        other.start = self.start
+        other.count = self.count
+        other.range = self.range
+        return other
+
+    def _sceneState(self):
+        geometry = (self.p1.x, self.p1.y, self.p2.x, self.p2.y)
+        return geometry, {"capacity": self.capacity, "range": self.range}, \
+            self.getSamples().astype("<f8").tobytes()
+
+    @classmethod
+    def _fromScene(cls, geometry, config, extra, blob):
+        x1, y1, x2, y2 = geometry
+        chart = cls(Point(x1, y1), Point(x2, y2), extra["capacity"])
+        chart.config = config
+        if extra["range"]:
+            chart.range = tuple(extra["range"])
+        return chart.extend(np.frombuffer(blob, dtype="<f8"))
+
+    def append(self, value):
+        """Add one sample, dropping the oldest if the chart is full"""
+        return self.extend((value,))
+
+    def extend(self, values):
+        """Add a batch of samples (any sequence or array) with a single
+        update of the canvas"""
+        values = np.asarray(values, dtype=float).ravel()
+        n = len(values)
+        capacity = self.capacity
+        if n >= capacity:
+            self.samples[:] = values[-capacity:]
+            self.start = 0
+            self.count = capacity
+        elif n:
+            end = (self.start + self.count) % capacity
+            first = min(n, capacity - end)
+            self.samples[end:end+first] = values[:first]
+            self.samples[:n-first] = values[first:]
+            self.count += n
+            if self.count > capacity:
+                self.start = (self.start + self.count - capacity) % capacity
+                self.count = capacity
+        self._refresh()
+        return self
+
+    def clear(self):
+        """Remove all samples"""
+        self.start = 0
+        self.count = 0
+        self._refresh()
+        return self
+
+    def getSamples(self):
+        """Returns the samples, oldest first, as an array"""
+        return np.roll(self.samples, -self.start)[:self.count]
+
+    def setRange(self, low=None, high=None):
+        """Fix the values shown at the bottom and top of the chart. With no
+        arguments the chart rescales to fit its samples."""
+        self.range = None if low is None else (low, high)
+        self._refresh()
+        return self
+
+    def _drawSpec(self, canvas):
+        x1, y1 = canvas.toScreen(self.p1.x, self.p1.y)
+        x2, y2 = canvas.toScreen(self.p2.x, self.p2.y)
+        left, right = min(x1, x2), max(x1, x2)
+        top, bottom = min(y1, y2), max(y1, y2)
+        data = self.getSamples()
+        n = len(data)
+        if n < 2:  # Tk lines need two points
+            return "line", (right, bottom, right, bottom)
+        if self.range:
+            low, high = self.range
+        else:
+            low, high = data.min(), data.max()
+        if high == low:
+            low, high = low - 1, high + 1
+        step = (right - left) / float(max(self.capacity - 1, 1))
+        screen = np.empty((n, 2))
+        screen[:, 0] = right - step * np.arange(n-1, -1, -1)
+        screen[:, 1] = bottom - (data - low) * ((bottom - top) / float(high - low))
+        if n > 4 * (right - left + 1):
+            # More samples than pixels: keep the first, lowest, highest and
+            #   last sample in each pixel column, which looks the same
+            column = np.floor(screen[:, 0] + 0.5)
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(column)) + 1))
+            ends = np.append(starts[1:], n) - 1
+            ys = screen[:, 1]
+            screen = np.empty((4 * len(starts), 2))
+            screen[:, 0] = np.repeat(column[starts], 4)
+            screen[:, 1] = np.column_stack((ys[starts], np.minimum.reduceat(ys, starts),
+                                            np.maximum.reduceat(ys, starts), ys[ends])).ravel()
+        elif canvas.lodTolerance and n >= LOD_MIN_VERTICES:
+            screen = screen[_simplify(screen, canvas.lodTolerance)]
+        return "line", np.floor(screen + 0.5).astype(int).ravel().tolist()
+
+    def _refresh(self):
+        # Move the existing canvas line to the current samples
+        canvas = self.canvas
+        if canvas and not canvas.isClosed() and self.id is not None:
+            canvas._markObject(self)
+            canvas.coords(self.id, *self._drawSpec(canvas)[1])
+            canvas._markObject(self)
+            if canvas.autoflush and not _deferFlush:
+                _root.update()
+
+
+class Grid(_BBox):
+
+    """A grid of cells covering the area between p1 and p2, coloured by a
+    2-D array of indices into a list of colors (or an n x 3 array). The
+    cells are drawn into a single image, and setData only repaints the
+    part of the image that changed. Each cell is a whole number of pixels
+    (with more cells than pixels, only every few cells are shown, one
+    pixel each), so the image can stop short of p2 but never reaches past
+    it."""
+
+    def __init__(self, p1, p2, data, palette):
+        _BBox.__init__(self, p1, p2, [])
+        self.data = np.array(data, dtype=int)
+        if self.data.ndim != 2:
+            raise GraphicsError(BAD_OPTION)
+        self.palette = _colorList(palette)
+        self.img = None  # the displayed image
+        self.cells = None  # image with one pixel per cell
+        self.cellSize = None  # (width, height) of a cell in pixels
+        self.subsample = None  # show every (across, down)th cell
+
+    def __repr__(self):
+        return "Grid({}, {}, {}x{})".format(self.p1, self.p2, *self.data.shape)
+
+    def clone(self):
+        return Grid(self.p1, self.p2, self.data, self.palette)
+
+    def _sceneState(self):
+        geometry = (self.p1.x, self.p1.y, self.p2.x, self.p2.y)
+        extra = {"shape": list(self.data.shape), "palette": self.palette}
+        return geometry, extra, self.data.astype("<i8").tobytes()
+
+    @classmethod
+    def _fromScene(cls, geometry, config, extra, blob):
+        x1, y1, x2, y2 = geometry
+        data = np.frombuffer(blob, dtype="<i8").reshape(extra["shape"])
+        return cls(Point(x1, y1), Point(x2, y2), data, extra["palette"])
+
+    def getData(self):
+        """Returns a copy of the array of palette indices"""
+        return self.data.copy()
+
+    def setData(self, data):
+        """Replace the array of palette indices, repainting only the
+        rectangle of cells that changed"""
+        data = np.asarray(data, dtype=int)
+        if data.shape != self.data.shape:
+            raise GraphicsError(BAD_OPTION)
+        changed = data != self.data
+        rows = np.flatnonzero(changed.any(axis=1))
+        if not len(rows):
+            return self
+        cols = np.flatnonzero(changed.any(axis=0))
+        self.data = data.copy()
+        self._paint(int(rows[0]), int(rows[-1])+1, int(cols[0]), int(cols[-1])+1)
+        return self
+
+    def setCell(self, row, col, index):
+        """Set the palette index of a single cell"""
+        self.data[row, col] = index
+        self._paint(row, row+1, col, col+1)
+        return self
+
+    def setPalette(self, palette):
+        """Replace the list of colors; palette may also be an n x 3 array
+        of red, green and blue intensities"""
+        self.palette = _colorList(palette)
+        rows, cols = self.data.shape
+        self._paint(0, rows, 0, cols)
+        return self
+
+    def _draw(self, canvas, options):
+        x1, y1 = canvas.toScreen(self.p1.x, self.p1.y)
+        x2, y2 = canvas.toScreen(self.p2.x, self.p2.y)
+        rows, cols = self.data.shape
+        width, across = _gridScale(cols, abs(x2-x1))
+        height, down = _gridScale(rows, abs(y2-y1))
+        self.cellSize = (width, height)
+        self.subsample = (across, down)
+        self.cells = tk.PhotoImage(master=_root, width=cols, height=rows)
+        self.img = tk.PhotoImage(master=_root, width=-(-cols // across) * width,
+                                 height=-(-rows // down) * height)
+        self._blit(0, rows, 0, cols)
+        return canvas.create_image(min(x1, x2), min(y1, y2), image=self.img, anchor="nw")
+
+    def _svg(self, canvas):
+        if self.img is None:
+            return None
+        x1, y1 = canvas.toScreen(self.p1.x, self.p1.y)
+        x2, y2 = canvas.toScreen(self.p2.x, self.p2.y)
+        return _svgImage(min(x1, x2), min(y1, y2), self.img)
+
+    def _paint(self, r1, r2, c1, c2):
+        # Repaint cells r1 <= row < r2, c1 <= col < c2 if drawn
+        canvas = self.canvas
+        if self.img is not None and canvas and not canvas.isClosed() and self.id is not None:
+            self._blit(r1, r2, c1, c2)
+            canvas._markObject(self)
+            if canvas.autoflush and not _deferFlush:
+                _root.update()
+
+    def _blit(self, r1, r2, c1, c2):
+        # Puts the block of cells into the one-pixel-per-cell image in one
+        #   call, then copies it scaled into the displayed image in another
+        colors = np.array([_tclQuote(color) for color in self.palette], dtype=object)
+        block = colors[self.data[r1:r2, c1:c2]]
+        self.cells.put(" ".join("{" + " ".join(row) + "}" for row in block.tolist()), to=(c1, r1))
+        width, height = self.cellSize
+        across, down = self.subsample
+        # Subsampling keeps every across-th column from the first, so start
+        #   the copy on one of those
+        c1, r1 = c1 - c1 % across, r1 - r1 % down
+        self.img.tk.call(self.img, "copy", self.cells, "-from", c1, r1, c2, r2,
+                         "-to", c1 // across * width, r1 // down * height,
+                         "-zoom", width, height, "-subsample", across, down)
+
+
+class Instance(GraphicsObject):
+
+    """A lightweight copy of another object, its definition, shifted by
+    (dx, dy). An Instance stores only its offset and shares everything
+    else with the definition (Image pixels included), so one definition
+    can be shown many times in any number of windows. Changing the
+    definition's options (through it or any instance) or moving it updates
+    every drawn instance with one call into Tk per window. Other changes to
+    the definition show when an instance is next drawn."""
+
+    def __init__(self, definition, dx=0, dy=0):
+        if isinstance(definition, Instance):
+            dx, dy = dx + definition.dx, dy + definition.dy
+            definition = definition.definition
+        if isinstance(definition, (Entry, Grid)):  # these own a widget or image per window
+            raise GraphicsError(UNSUPPORTED_METHOD)
+        GraphicsObject.__init__(self, [])
+        self.definition = definition
+        self.config = definition.config  # shared, not copied
+        self.dx = dx
+        self.dy = dy
+        # Keep the definition's aliases, like Line's setOutline = setFill
+        if "setOutline" in vars(definition):
+            self.setOutline = self.setFill
+        if "setFill" in vars(definition):
+            self.setFill = self.setOutline
+        if definition._instanceTag is None:
+            definition._instanceTag = "instances{}".format(next(_instanceTags))
+            definition._instanceWins = weakref.WeakSet()
+
+    def __repr__(self):
+        return "Instance({}, {}, {})".format(self.definition, self.dx, self.dy)
+
+    def clone(self):
+        return Instance(self.definition, self.dx, self.dy)
+
+    def getDefinition(self):
+        return self.definition
+
+    def getOffset(self):
+        """Returns the offset from the definition as a Point"""
+        return Point(self.dx, self.dy)
+
+    def _reconfig(self, option, setting):
+        # Options belong to the definition
+        self.definition._reconfig(option, setting)
+
+    def _sceneState(self):
+        # Scene files replace the definition with a reference to it
+        return (self.dx, self.dy), {"definition": self.definition}, b""
+
+    @classmethod
+    def _fromScene(cls, geometry, config, extra, blob):
+        return cls(extra["definition"], *geometry)
+
+    def _itemTags(self, canvas):
+        self.definition._instanceWins.add(canvas)
+        return self.definition._instanceTag
+
+    def _drawSpec(self, canvas):
+        spec = self.definition._drawSpec(canvas)
+        if spec is None:
+            return None
+        kind, coords = spec
+        sx, sy = _screenDelta(canvas, self.dx, self.dy)
+        sx, sy = int(round(sx)), int(round(sy))
+        coords = list(coords)
+        coords[0::2] = [x + sx for x in coords[0::2]]
+        coords[1::2] = [y + sy for y in coords[1::2]]
+        return kind, coords
+
+    def _draw(self, canvas, options):
+        options = dict(options)
+        options["tags"] = self._itemTags(canvas)
+        spec = self._drawSpec(canvas)
+        if spec is not None:
+            return canvas._createItem(spec[0], spec[1], options)
+        # An Image: show the definition's PhotoImage, which this instance
+        #   keeps alive through the definition
+        x, y = self._imageCenter(canvas)
+        return canvas.create_image(x, y, image=self.definition.img, tags=options["tags"])
+
+    def _imageCenter(self, canvas):
+        anchor = self.definition.anchor
+        return canvas.toScreen(anchor.x + self.dx, anchor.y + self.dy)
+
+    def _svg(self, canvas):
+        if isinstance(self.definition, Image):
+            x, y = self._imageCenter(canvas)
+            img = self.definition.img
+            return _svgImage(x - img.width() // 2, y - img.height() // 2, img)
+        return GraphicsObject._svg(self, canvas)
+
+    def _move(self, dx, dy):
+        self.dx = self.dx + dx
+        self.dy = self.dy + dy
+
+    def _worldBBox(self):
+        box = self.definition._worldBBox()
+        if box is None:
+            return None
+        x1, y1, x2, y2 = box
+        return x1 + self.dx, y1 + self.dy, x2 + self.dx, y2 + self.dy
+
+    def _screenBBox(self, canvas):
+        box = self._worldBBox()
+        if box is None:
+            return GraphicsObject._screenBBox(self, canvas)
+        x1, y1 = canvas.toScreen(box[0], box[1])
+        x2, y2 = canvas.toScreen(box[2], box[3])
+        pad = self._pad()
+        return min(x1, x2)-pad, min(y1, y2)-pad, max(x1, x2)+pad, max(y1, y2)+pad
+
+    def _shape(self):
+        shape = self.definition._shape()
+        if shape is None:
+            return None
+        dx, dy = self.dx, self.dy
+        if shape[0] == "ellipse":
+            kind, cx, cy, rx, ry = shape
+            return kind, cx + dx, cy + dy, rx, ry
+        return shape[0], [(x + dx, y + dy) for x, y in shape[1]]
+
+    def containsPoint(self, p):
+        if p is None:
+            return
+        return self.definition.containsPoint(Point(p.x - self.dx, p.y - self.dy))
+
+
 class Text(GraphicsObject):
     
     def __init__(self, p, text, **kwargs):
@@ -759,14 +2706,44 @@ class Text(GraphicsObject):
     def __repr__(self):
         return "Text({}, '{}')".format(self.anchor, self.getText())
         
-    def _draw(self, canvas, options):
+    def _drawSpec(self, canvas):
         p = self.anchor
         x, y = canvas.toScreen(p.x, p.y)
-        return canvas.create_text(x, y, options)
+        return "text", (x, y)
         
     def _move(self, dx, dy):
         self.anchor.move(dx, dy)
-        
+
+    def _worldBBox(self):
+        width, height = _textSize(self.config["font"], self.config["text"])
+        return _pixelBox(self.canvas, self.anchor, width, height)
+
+    def _screenBBox(self, canvas):
+        x, y = canvas.toScreen(self.anchor.x, self.anchor.y)
+        width, height = _textSize(self.config["font"], self.config["text"])
+        return x - width // 2, y - height // 2, x + (width+1) // 2, y + (height+1) // 2
+
+    def getBoundingBox(self):
+        """Returns a Rectangle around the text, measured without drawing
+        it. World sizes are only known once the text is drawn in a window
+        with coordinates; until then one pixel is one unit."""
+        return _boxRectangle(self._worldBBox())
+
+    def containsPoint(self, p):
+        if p is None:
+            return
+        return _boxContains(self._worldBBox(), p)
+
+    def _sceneState(self):
+        return (self.anchor.x, self.anchor.y), None, b""
+
+    @classmethod
+    def _fromScene(cls, geometry, config, extra, blob):
+        obj = _bare(cls, config)
+        obj.anchor = _scenePoint(*geometry)
+        obj.setOutline = obj.setFill
+        return obj
+
     def clone(self):
         other = Text(self.anchor, self.config['text'])
         other.config = self.config.copy()
@@ -864,6 +2841,45 @@ class Entry(GraphicsObject):
     def _move(self, dx, dy):
         self.anchor.move(dx, dy)
 
+    def _worldBBox(self):
+        # Tk sizes entries in "0" characters of their font
+        width, height = _textSize(self.font, "0" * self.width)
+        return _pixelBox(self.canvas, self.anchor, width + 2*ENTRY_PADDING, height + 2*ENTRY_PADDING)
+
+    def getBoundingBox(self):
+        """Returns a Rectangle around the entry box"""
+        return _boxRectangle(self._worldBBox())
+
+    def containsPoint(self, p):
+        if p is None:
+            return
+        return _boxContains(self._worldBBox(), p)
+
+    def _svg(self, canvas):
+        box = self._screenBBox(canvas)
+        if box is None:
+            return None
+        x1, y1, x2, y2 = box
+        frame = _svgElement("rectangle", box, {"fill": self.fill, "outline": "black", "width": 1})
+        text = _svgElement("text", ((x1+x2) / 2.0, (y1+y2) / 2.0),
+                           {"fill": self.color, "font": self.font, "text": self.getText()})
+        return frame + text
+
+    def _sceneState(self):
+        extra = {"width": self.width, "text": self.getText(), "fill": self.fill,
+                 "color": self.color, "font": self.font}
+        return (self.anchor.x, self.anchor.y), extra, b""
+
+    @classmethod
+    def _fromScene(cls, geometry, config, extra, blob):
+        entry = cls(Point(*geometry), extra["width"])
+        entry.config = config
+        entry.text.set(extra["text"])
+        entry.fill = extra["fill"]
+        entry.color = extra["color"]
+        entry.font = tuple(extra["font"])
+        return entry
+
     def getAnchor(self):
         return self.anchor.clone()
 
@@ -923,7 +2939,9 @@ class Entry(GraphicsObject):
 class Image(GraphicsObject):
 
     idCount = 0
-    imageCache = {}  # tk photoimages go here to avoid GC while drawn
+    # tk photoimages of drawn Images; the window's items keep them alive,
+    #   so the cache never holds on to an image itself
+    imageCache = weakref.WeakValueDictionary()
     
     def __init__(self, p, *pixmap, **kwargs):
         GraphicsObject.__init__(self, [])
@@ -954,7 +2972,33 @@ class Image(GraphicsObject):
     
     def _move(self, dx, dy):
         self.anchor.move(dx, dy)
-        
+
+    def _svg(self, canvas):
+        x, y = canvas.toScreen(self.anchor.x, self.anchor.y)
+        return _svgImage(x - self.getWidth() // 2, y - self.getHeight() // 2, self.img)
+
+    def _sceneState(self):
+        return (self.anchor.x, self.anchor.y), None, _pngData(self.img).encode("ascii")
+
+    @classmethod
+    def _fromScene(cls, geometry, config, extra, blob):
+        image = cls(Point(*geometry), 0, 0)
+        image.config = config
+        image.img = tk.PhotoImage(master=_root, data=blob, format="png")
+        return image
+
+    def _worldBBox(self):
+        return _pixelBox(self.canvas, self.anchor, self.getWidth(), self.getHeight())
+
+    def getBoundingBox(self):
+        """Returns a Rectangle around the image"""
+        return _boxRectangle(self._worldBBox())
+
+    def containsPoint(self, p):
+        if p is None:
+            return
+        return _boxContains(self._worldBBox(), p)
+
     def undraw(self):
         try:
             del self.imageCache[self.imageId]  # allow gc of tk photoimage
@@ -995,12 +3039,34 @@ class Image(GraphicsObject):
             return list(map(int, value.split())) 
 
     def setPixel(self, x, y, color):
-        """Sets pixel (x,y) to the given color
-        
+        """Sets pixel (x,y) to the given color, a color string or an
+        (r,g,b) sequence
+
         """
+        if not isinstance(color, str):
+            color = Color(*color)
         self.img.put("{" + color + "}", (x, y))
         return self
 
+    def getPixels(self):
+        """Returns the whole image as a height x width x 3 array of red,
+        green and blue intensities, read with a single call into Tk"""
+        data = self.img.tk.call(self.img, "data")
+        digits = "".join(re.findall(r"#([0-9a-fA-F]{6})", str(data)))
+        pixels = np.frombuffer(binascii.unhexlify(digits), dtype=np.uint8)
+        return pixels.reshape(self.getHeight(), self.getWidth(), 3).copy()
+
+    def setPixels(self, pixels, x=0, y=0):
+        """Sets a block of pixels with its top left corner at (x,y) from a
+        height x width x 3 array of red, green and blue intensities, with a
+        single call into Tk"""
+        pixels = np.asarray(pixels)
+        if pixels.ndim != 3 or pixels.shape[2] != 3:
+            raise GraphicsError(BAD_OPTION)
+        rows = colorStrings(pixels)
+        self.img.put(" ".join("{" + " ".join(row) + "}" for row in rows), to=(x, y))
+        return self
+
     def save(self, filename):
         """Saves the pixmap image to filename.
         The format for the save image is determined from the filname extension.
@@ -1011,10 +3077,456 @@ class Image(GraphicsObject):
         self.img.write(filename, format=ext)
 
         
+def renderFrames(setup, step, frames, filename="frame{:04d}.eps", width=200, height=200, processes=None):
+    """Render an animation frame by frame across a pool of processes.
+
+    Each worker opens its own hidden GraphWin of the given size and calls
+    setup(win), which builds the scene and returns any state step needs.
+    Then, for each of its frames, it calls step(win, state, frame) and saves
+    the window to filename.format(frame), as SVG if the name ends in .svg.
+    setup and step must be module-level functions so they can be sent to
+    the workers, and step must depend only on the frame number, not on
+    earlier frames. Each worker opens Tk, so a display is needed even for
+    SVG output. Workers are started with the "spawn" method, which imports
+    the calling script again in each of them, so the script must call
+    renderFrames only under an if __name__ == "__main__": guard (or
+    multiprocessing raises a RuntimeError). Returns the list of file names
+    in frame order."""
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, frames))
+    chunks = []
+    for i in range(processes):
+        start, stop = frames * i // processes, frames * (i+1) // processes
+        chunks.append((setup, step, start, stop, filename, width, height))
+    if processes == 1:
+        return _renderChunk(chunks[0])
+    pool = multiprocessing.get_context("spawn").Pool(processes)
+    try:
+        results = pool.map(_renderChunk, chunks)
+    finally:
+        pool.close()
+        pool.join()
+    return [name for names in results for name in names]
+
+
+def _writeScene(f, objects, header):
+    # Scene files hold SCENE_MAGIC, then a length-prefixed JSON header, then
+    #   one record per object. Each record is a type byte and a config
+    #   number, followed by the geometry as doubles and length-prefixed JSON
+    #   and binary data whose meaning depends on the type. An object's
+    #   config is stored as JSON the first time it is used (type byte 255)
+    #   and referred to by number after that.
+    #
+    #   The definitions of Instances come first, each an object record
+    #   marked by type byte 254 as not to be drawn, numbered in order. An
+    #   Instance refers to its definition by that number, and a definition
+    #   that is drawn itself is a type byte 253 and the number.
+    f.write(SCENE_MAGIC)
+    _writeBlock(f, json.dumps(header).encode("utf-8"))
+    configs = {}
+    definitions = {}  # id of definition -> number
+    for obj in objects:
+        if isinstance(obj, Instance) and id(obj.definition) not in definitions:
+            definitions[id(obj.definition)] = len(definitions)
+            f.write(struct.pack("<B", 254))
+            _writeObject(f, obj.definition, configs, definitions)
+    for obj in objects:
+        number = definitions.get(id(obj))
+        if number is not None:
+            f.write(struct.pack("<BI", 253, number))
+        else:
+            _writeObject(f, obj, configs, definitions)
+
+
+def _sceneType(obj):
+    # Index in _SCENE_TYPES of the nearest class of obj that scene files
+    #   know, so subclasses save (and load) as that class
+    for cls in type(obj).__mro__:
+        if cls.__name__ in _SCENE_TYPES and globals()[cls.__name__] is cls:
+            return _SCENE_TYPES.index(cls.__name__)
+    raise GraphicsError(UNSUPPORTED_METHOD)
+
+
+def _writeObject(f, obj, configs, definitions):
+    kind = _sceneType(obj)
+    config = json.dumps(obj.config, sort_keys=True)
+    number = configs.get(config)
+    if number is None:
+        number = configs[config] = len(configs)
+        f.write(struct.pack("<B", 255))
+        _writeBlock(f, config.encode("utf-8"))
+    geometry, extra, blob = obj._sceneState()
+    if extra and "definition" in extra:
+        extra = dict(extra, definition=definitions[id(extra["definition"])])
+    f.write(struct.pack("<BII", kind, number, len(geometry)))
+    f.write(struct.pack("<{}d".format(len(geometry)), *geometry))
+    _writeBlock(f, json.dumps(extra).encode("utf-8") if extra is not None else b"")
+    _writeBlock(f, blob)
+
+
+def _writeBlock(f, data):
+    f.write(struct.pack("<I", len(data)))
+    f.write(data)
+
+
+def _readScene(f):
+    # Returns the header of the scene file f and a generator of its objects
+    if f.read(len(SCENE_MAGIC)) != SCENE_MAGIC:
+        raise GraphicsError("not a scene file")
+    header = json.loads(_readBlock(f).decode("utf-8"))
+
+    def objects():
+        configs = []
+        definitions = []
+        defining = False  # is the next object a definition?
+        while True:
+            kind = f.read(1)
+            if not kind:
+                return
+            kind = ord(kind)
+            if kind == 255:
+                config = json.loads(_readBlock(f).decode("utf-8"))
+                if "font" in config:
+                    config["font"] = tuple(config["font"])
+                configs.append(config)
+                continue
+            if kind == 254:
+                defining = True
+                continue
+            if kind == 253:
+                number, = struct.unpack("<I", f.read(4))
+                yield definitions[number]
+                continue
+            number, n = struct.unpack("<II", f.read(8))
+            geometry = struct.unpack("<{}d".format(n), f.read(8*n))
+            extra = _readBlock(f)
+            extra = json.loads(extra.decode("utf-8")) if extra else None
+            blob = _readBlock(f)
+            if extra and "definition" in extra:
+                extra["definition"] = definitions[extra["definition"]]
+            cls = globals()[_SCENE_TYPES[kind]]
+            obj = cls._fromScene(geometry, dict(configs[number]), extra, blob)
+            if defining:
+                definitions.append(obj)
+                defining = False
+            else:
+                yield obj
+    return header, objects()
+
+
+def _readBlock(f):
+    n, = struct.unpack("<I", f.read(4))
+    return f.read(n)
+
+
+def _bare(cls, config):
+    # Makes an object of class cls without running its constructor; used
+    #   when loading scenes, which have every attribute to hand already
+    obj = cls.__new__(cls)
+    obj.canvas = None
+    obj.id = None
+    obj._handlers = None
+    obj.config = config
+    return obj
+
+
+def _scenePoint(x, y):
+    p = _bare(Point, {"outline": DEFAULT_CONFIG["outline"], "fill": DEFAULT_CONFIG["fill"]})
+    p.setFill = p.setOutline
+    p.x = x
+    p.y = y
+    return p
+
+
+_fonts = {}  # font -> (tkfont.Font, linespace)
+_textSizes = collections.OrderedDict()  # (face, size, style, text) -> (width, height)
+
+
+def _textSize(font, text):
+    # Returns the (width, height) in pixels of text in font, a (face, size,
+    #   style) tuple. Measuring is a trip into Tk, so the last
+    #   TEXT_CACHE_SIZE sizes are kept, least recently used first out.
+    face, size, style = font
+    key = (face, size, style, text)
+    found = _textSizes.pop(key, None)
+    if found is None:
+        metrics = _fonts.get(key[:3])
+        if metrics is None:
+            measurer = tkfont.Font(root=_root, font=key[:3])
+            metrics = _fonts[key[:3]] = (measurer, measurer.metrics("linespace"))
+        measurer, linespace = metrics
+        lines = str(text).split("\n")
+        found = (max(measurer.measure(line) for line in lines), linespace * len(lines))
+        if len(_textSizes) >= TEXT_CACHE_SIZE:
+            _textSizes.popitem(last=False)
+    _textSizes[key] = found
+    return found
+
+
+def _pixelBox(canvas, anchor, width, height):
+    # World (x1, y1, x2, y2) of a width x height pixel box centered on anchor
+    #   in canvas, which may be None
+    dx = width / 2.0
+    dy = height / 2.0
+    if canvas and canvas.trans:
+        dx = dx * abs(canvas.trans.xscale)
+        dy = dy * abs(canvas.trans.yscale)
+    x, y = anchor.x, anchor.y
+    return x-dx, y-dy, x+dx, y+dy
+
+
+def _boxRectangle(box):
+    x1, y1, x2, y2 = box
+    return Rectangle(Point(x1, y1), Point(x2, y2))
+
+
+def _boxContains(box, p):
+    x1, y1, x2, y2 = box
+    return x1 <= p.x <= x2 and y1 <= p.y <= y2
+
+
+def _gridScale(cells, pixels):
+    # Returns (zoom, subsample) that fit cells into at most pixels pixels
+    pixels = max(1, int(pixels))
+    if cells <= pixels:
+        return pixels // cells, 1
+    return 1, -(-cells // pixels)
+
+
+def _screenDelta(canvas, dx, dy):
+    # Screen distance in canvas of a world distance (dx, dy)
+    trans = canvas.trans
+    if trans:
+        return dx / trans.xscale, -dy / trans.yscale
+    return dx, dy
+
+
+def _imageBytes(img):
+    return img.width() * img.height() * PIXEL_BYTES
+
+
+def _svgElement(kind, coords, config):
+    # SVG for a canvas item of the given kind, coordinates and options, as
+    #   returned by _drawSpec
+    if kind == "text":
+        x, y = coords
+        family, size, style = config.get("font", DEFAULT_CONFIG["font"])
+        lines = str(config.get("text", "")).split("\n")
+        attrs = 'x="{}" y="{}" fill={} font-family={} font-size="{}pt"'.format(
+            x, y, quoteattr(_svgColor(config.get("fill", ""))), quoteattr(family), size)
+        if "bold" in style:
+            attrs += ' font-weight="bold"'
+        if "italic" in style:
+            attrs += ' font-style="italic"'
+        if len(lines) == 1:
+            return '<text {} text-anchor="middle" dominant-baseline="central">{}</text>'.format(
+                attrs, escape(lines[0]))
+        anchor = {"left": "start", "right": "end"}.get(config.get("justify"), "middle")
+        spans = "".join('<tspan x="{}" dy="{}em">{}</tspan>'.format(
+            x, -0.6 * (len(lines)-1) if i == 0 else 1.2, escape(line)) for i, line in enumerate(lines))
+        return '<text {} text-anchor="{}" dominant-baseline="central">{}</text>'.format(attrs, anchor, spans)
+    width = config.get("width", DEFAULT_CONFIG["width"])
+    if kind == "line":
+        # Tk draws lines in their fill color
+        style = 'fill="none" stroke={} stroke-width="{}"'.format(
+            quoteattr(_svgColor(config.get("fill", ""))), width)
+        arrow = config.get("arrow", "none")
+        if arrow in ("first", "both"):
+            style += ' marker-start="url(#arrow)"'
+        if arrow in ("last", "both"):
+            style += ' marker-end="url(#arrow)"'
+        return '<polyline points="{}" {}/>'.format(_svgPoints(coords), style)
+    style = 'fill={} stroke={} stroke-width="{}"'.format(
+        quoteattr(_svgColor(config.get("fill", ""))), quoteattr(_svgColor(config.get("outline", ""))), width)
+    if kind == "polygon":
+        return '<polygon points="{}" {}/>'.format(_svgPoints(coords), style)
+    x1, y1, x2, y2 = coords
+    x1, x2 = min(x1, x2), max(x1, x2)
+    y1, y2 = min(y1, y2), max(y1, y2)
+    if kind == "oval":
+        return '<ellipse cx="{}" cy="{}" rx="{}" ry="{}" {}/>'.format(
+            (x1+x2) / 2.0, (y1+y2) / 2.0, (x2-x1) / 2.0, (y2-y1) / 2.0, style)
+    return '<rect x="{}" y="{}" width="{}" height="{}" {}/>'.format(x1, y1, x2-x1, y2-y1, style)
+
+
+def _svgPoints(coords):
+    coords = list(coords)
+    return " ".join("{},{}".format(x, y) for x, y in zip(coords[::2], coords[1::2]))
+
+
+def _svgImage(x, y, img):
+    return '<image x="{}" y="{}" width="{}" height="{}" xlink:href="data:image/png;base64,{}"/>'.format(
+        x, y, img.width(), img.height(), _pngData(img))
+
+
+def _pngData(img):
+    # Contents of the PhotoImage img as base64 encoded PNG
+    data = img.tk.call(img, "data", "-format", "png")
+    if isinstance(data, bytes):
+        data = data.decode("ascii")
+    return str(data)
+
+
+_svgColors = {"": "none"}  # Tk color -> SVG color
+
+
+def _svgColor(color):
+    # Tk accepts X11 names, such as "gray50" and "light blue", that SVG
+    #   doesn't, so anything but #rgb is looked up once and written as #rrggbb
+    svg = _svgColors.get(color)
+    if svg is None:
+        if color.startswith("#"):
+            svg = color
+        else:
+            r, g, b = _root.winfo_rgb(color)
+            svg = "#%02x%02x%02x" % (r >> 8, g >> 8, b >> 8)
+        _svgColors[color] = svg
+    return svg
+
+
+def _tclQuote(value):
+    # Quotes value as a single word of a Tcl script
+    if isinstance(value, (tuple, list)):
+        value = " ".join(map(_tclQuote, value))
+    else:
+        value = str(value)
+    if _TCL_BARE.match(value):
+        return value
+    if not _TCL_UNSAFE.search(value):
+        return "{" + value + "}"
+    return "\"" + _TCL_SPECIAL.sub(lambda m: _TCL_ESCAPES.get(m.group(), "\\" + m.group()), value) + "\""
+
+
+def _tclOptions(config):
+    # Formats an item configuration dictionary as Tcl "-option value" words
+    return " ".join("-{} {}".format(key, _tclQuote(value)) for key, value in config.items())
+
+
+def _renderChunk(args):
+    # Worker for renderFrames; a spawned worker imports this module afresh,
+    #   so it has its own _root
+    setup, step, start, stop, filename, width, height = args
+    win = GraphWin("Rendering", width, height, autoflush=False)
+    win.master.withdraw()
+    names = []
+    try:
+        state = setup(win)
+        for frame in range(start, stop):
+            step(win, state, frame)
+            name = filename.format(frame)
+            win.save(name)
+            names.append(name)
+    finally:
+        win.close()
+    return names
+
+
+# Classes that can be saved in scene files, in type byte order
+_SCENE_TYPES = ("Point", "Rectangle", "Oval", "Circle", "Line", "Polygon", "Text",
+                "Entry", "Image", "LineChart", "Grid", "Instance")
+
+
+_colors = collections.OrderedDict()  # color string or (r, g, b) -> Color
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+class Color(str):
+
+    """A color, usable anywhere a color string is. Made from red, green
+    and blue intensities in range(256), Color(r, g, b), or from any color
+    string Tk understands, Color("light blue"). Colors are cached, so
+    making the same color again returns the same object without any
+    formatting or parsing."""
+
+    def __new__(cls, r, g=None, b=None):
+        key = r if g is None else (r, g, b)
+        color = _colors.pop(key, None)
+        if color is None:
+            if g is None:
+                r, g, b = _parseColor(r)
+            rgb = (int(r), int(g), int(b))
+            color = str.__new__(cls, "#%02x%02x%02x" % rgb)
+            color.rgb = rgb
+            if len(_colors) >= COLOR_CACHE_SIZE:
+                _colors.popitem(last=False)
+        _colors[key] = color
+        return color
+
+    def __repr__(self):
+        return "Color({}, {}, {})".format(*self.rgb)
+
+    def getRGB(self):
+        """Returns a tuple (r, g, b) of intensities in range(256)"""
+        return self.rgb
+
+
+def _parseColor(color):
+    # Returns the (r, g, b) intensities of a Tk color string
+    if isinstance(color, Color):
+        return color.rgb
+    digits = color[1:]
+    if color.startswith("#") and len(digits) in (3, 6, 9, 12):
+        # Like Tk, take the digits given as the most significant bits
+        n = len(digits) // 3
+        try:
+            values = [int(digits[i*n:i*n+n] + "0", 16) for i in range(3)]
+        except ValueError:
+            raise GraphicsError(BAD_OPTION)
+        return tuple(value >> (4*n - 4) for value in values)
+    try:
+        r, g, b = _root.winfo_rgb(color)
+    except tk.TclError:
+        raise GraphicsError(BAD_OPTION)
+    return r >> 8, g >> 8, b >> 8
+
+
+def colorArray(colors):
+    """Returns an n x 3 array of the red, green and blue intensities of
+    colors, a sequence of color strings"""
+    return np.array([Color(color).rgb for color in colors], dtype=np.uint8).reshape(-1, 3)
+
+
+def colorStrings(rgb):
+    """Returns the color strings of an array of red, green and blue
+    intensities whose last axis has length 3, nested the same way as the
+    other axes of the array"""
+    rgb = np.clip(np.rint(np.asarray(rgb, dtype=float)), 0, 255).astype(np.int64)
+    if rgb.shape[-1:] != (3,):
+        raise GraphicsError(BAD_OPTION)
+    # Write the "#rrggbb" bytes of every color at once, then view each row
+    #   of seven bytes as one string
+    chars = np.empty(rgb.shape[:-1] + (7,), dtype=np.uint8)
+    chars[..., 0] = ord("#")
+    chars[..., 1::2] = _HEX_DIGITS[rgb >> 4]
+    chars[..., 2::2] = _HEX_DIGITS[rgb & 15]
+    return chars.view("S7")[..., 0].astype(str).tolist()
+
+
+def gradient(colors, n):
+    """Returns a list of n Colors running evenly through colors, a list of
+    two or more color strings, as a palette for Grid or fillMany"""
+    stops = colorArray(colors).astype(float)
+    at = np.linspace(0, len(stops) - 1, n)
+    rgb = [np.interp(at, np.arange(len(stops)), stops[:, i]) for i in range(3)]
+    return [Color(*row) for row in np.rint(np.stack(rgb, axis=1)).astype(int).tolist()]
+
+
+def _colorList(colors):
+    # Returns colors, a sequence of color strings or an n x 3 array of
+    #   intensities, as a list of color strings
+    if isinstance(colors, np.ndarray) and colors.dtype.kind in "iuf":
+        return colorStrings(colors)
+    colors = list(colors)
+    if colors and not isinstance(colors[0], str):
+        return colorStrings(colors)
+    return colors
+
+
 def color_rgb(r, g, b):
     """r,g,b are intensities of red, green, and blue in range(256)
     Returns color specifier string for the resulting color"""
-    return "#%02x%02x%02x" % (r, g, b)
+    return Color(r, g, b)
 
 
 def _clickedOn(item, check):
@@ -1108,5 +3620,7 @@ def test():
 # MacOS fix 1
 update()
 
+_root.after(COMMAND_TICK, _drainCommands)
+
 if __name__ == "__main__":
     test()
@@ -0,0 +1,260 @@
+"""Checks for graphics.py. Importing graphics opens Tk, so these are
+skipped when there is no display. Run with:
+
+    python -m pytest test_graphics.py
+"""
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+try:
+    from graphics import GraphWin, Point, Line, Rectangle, Oval, Circle, Image, Instance, Grid, \
+        Text, Entry, GraphicsError
+except Exception:  # no display for Tk
+    graphicsLoaded = False
+else:
+    graphicsLoaded = True
+
+
+@unittest.skipUnless(graphicsLoaded, "graphics needs a display")
+class IntersectsTest(unittest.TestCase):
+
+    def testNumpyCoordinates(self):
+        box = Rectangle(Point(np.float64(0), 0), Point(10, 10))
+        self.assertTrue(box.intersects(Line(Point(np.float64(5), -5), Point(5, 15))))
+        self.assertFalse(box.intersects(Line(Point(np.float64(20), -5), Point(20, 15))))
+
+    def testFlatOval(self):
+        flat = Oval(Point(0, 5), Point(10, 5))
+        self.assertTrue(flat.intersects(Circle(Point(5, 5), 2)))
+        self.assertTrue(flat.intersects(Oval(Point(4, 0), Point(6, 10))))
+        self.assertFalse(flat.intersects(Circle(Point(5, 20), 2)))
+
+
+@unittest.skipUnless(graphicsLoaded, "graphics needs a display")
+class DrawManyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.win = GraphWin("drawMany", 100, 100, autoflush=False)
+
+    def tearDown(self):
+        self.win.close()
+
+    def testStackingOrder(self):
+        objects = [Image(Point(50, 50), 10, 10), Rectangle(Point(0, 0), Point(60, 60)),
+                   Image(Point(20, 20), 10, 10), Circle(Point(50, 50), 5)]
+        self.win.drawMany(objects)
+        self.assertEqual(self.win.find_all(), tuple(obj.id for obj in objects))
+
+    def testFillMany(self):
+        box = Rectangle(Point(0, 0), Point(10, 10))
+        entry = Entry(Point(50, 50), 5)
+        self.win.drawMany([box, entry])
+        self.win.fillMany([box, entry], ["red", "blue"])
+        self.assertEqual(self.win.itemcget(box.id, "fill"), "red")
+        self.assertEqual(entry.fill, "blue")
+        with self.assertRaises(GraphicsError):
+            self.win.fillMany([box, entry], ["green"])
+        self.assertEqual(box.config["fill"], "red")
+
+    def testSceneStackingOrder(self):
+        self.win.drawMany([Rectangle(Point(0, 0), Point(60, 60)), Image(Point(50, 50), 10, 10),
+                           Circle(Point(50, 50), 5), Image(Point(20, 20), 10, 10)])
+        handle, filename = tempfile.mkstemp(".pgs")
+        os.close(handle)
+        try:
+            self.win.saveScene(filename)
+            other = GraphWin("loaded", 100, 100, autoflush=False)
+            try:
+                loaded = other.loadScene(filename)
+                self.assertEqual([type(obj).__name__ for obj in loaded],
+                                 ["Rectangle", "Image", "Circle", "Image"])
+                self.assertEqual(other.find_all(), tuple(obj.id for obj in loaded))
+            finally:
+                other.close()
+        finally:
+            os.remove(filename)
+
+    def testSceneSubclass(self):
+        class Ball(Circle):
+            pass
+        self.win.drawMany([Ball(Point(50, 50), 5), Rectangle(Point(0, 0), Point(10, 10))])
+        handle, filename = tempfile.mkstemp(".pgs")
+        os.close(handle)
+        try:
+            self.win.saveScene(filename)
+            other = GraphWin("loaded", 100, 100, autoflush=False)
+            try:
+                ball, box = other.loadScene(filename)
+                self.assertIs(type(ball), Circle)
+                self.assertEqual(ball.getRadius(), 5)
+            finally:
+                other.close()
+        finally:
+            os.remove(filename)
+
+    def testSceneInstances(self):
+        drawn = Rectangle(Point(0, 0), Point(10, 10), fill="red")
+        hidden = Circle(Point(50, 50), 5)
+        self.win.drawMany([Instance(drawn, 20, 0), drawn, Instance(hidden, 0, 20), Instance(drawn, 40, 0)])
+        handle, filename = tempfile.mkstemp(".pgs")
+        os.close(handle)
+        try:
+            self.win.saveScene(filename)
+            other = GraphWin("loaded", 100, 100, autoflush=False)
+            try:
+                first, rect, third, second = other.loadScene(filename)
+                self.assertIs(first.getDefinition(), rect)
+                self.assertIs(second.getDefinition(), rect)
+                self.assertIs(first.config, rect.config)
+                self.assertEqual((first.dx, second.dx), (20, 40))
+                self.assertIsNone(third.getDefinition().canvas)
+                self.assertEqual(third.getOffset().getY(), 20)
+            finally:
+                other.close()
+        finally:
+            os.remove(filename)
+
+
+@unittest.skipUnless(graphicsLoaded, "graphics needs a display")
+class InstanceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.win = GraphWin("Instance", 100, 100, autoflush=False)
+
+    def tearDown(self):
+        self.win.close()
+
+    def testLineAlias(self):
+        line = Line(Point(0, 0), Point(10, 10))
+        Instance(line, 5, 5).setOutline("blue")
+        self.assertEqual(line.config["fill"], "blue")
+
+    def testFillMany(self):
+        box = Rectangle(Point(0, 0), Point(10, 10))
+        copies = [Instance(box, 20*i, 0) for i in range(3)]
+        self.win.drawMany(copies)
+        self.win.fillMany(copies[:1], "green")
+        self.assertEqual(box.config["fill"], "green")
+        for copy in copies:
+            self.assertEqual(self.win.itemcget(copy.id, "fill"), "green")
+
+
+@unittest.skipUnless(graphicsLoaded, "graphics needs a display")
+class GridTest(unittest.TestCase):
+
+    def setUp(self):
+        self.win = GraphWin("Grid", 100, 100, autoflush=False)
+
+    def tearDown(self):
+        self.win.close()
+
+    def testExtent(self):
+        for cols, width in ((30, 90), (100, 100), (250, 84), (1000, 100)):
+            grid = Grid(Point(0, 0), Point(100, 10), np.zeros((1, cols)), ["black"]).draw(self.win)
+            self.assertEqual(grid.img.width(), width)
+            grid.undraw()
+
+
+@unittest.skipUnless(graphicsLoaded, "graphics needs a display")
+class MouseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.win = GraphWin("Mouse", 100, 100, autoflush=False)
+
+    def tearDown(self):
+        self.win.close()
+
+    def testLeaveOntoEntry(self):
+        self.win._onMotion(SimpleNamespace(x=5, y=6))
+        self.win._onLeave(SimpleNamespace(detail="NotifyInferior"))
+        self.assertEqual(self.win.checkMousePosition().getX(), 5)
+        self.win._onLeave(SimpleNamespace(detail="NotifyAncestor"))
+        self.assertIsNone(self.win.checkMousePosition())
+
+    def testNotSeededBeforeMapped(self):
+        # autoflush=False leaves the window unmapped, with no known position
+        self.assertFalse(self.win.winfo_ismapped())
+        self.assertIsNone(self.win.checkMousePosition())
+
+
+@unittest.skipUnless(graphicsLoaded, "graphics needs a display")
+class CollisionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.win = GraphWin("collisions", 400, 400, autoflush=False)
+
+    def tearDown(self):
+        self.win.close()
+
+    def testGridFollowsObjectSize(self):
+        self.assertEqual(self.win.collisions(), [])  # grid made while empty
+        circles = [Circle(Point(20*i, 0), 15) for i in range(20)]
+        self.win.drawMany(circles)
+        pairs = self.win.collisions()
+        self.assertEqual(len(pairs), 19)
+        self.assertEqual(self.win._collide.large, set())
+        self.assertGreater(self.win._collide.cellSize, 15)
+
+
+@unittest.skipUnless(graphicsLoaded, "graphics needs a display")
+class VirtualTest(unittest.TestCase):
+
+    def setUp(self):
+        self.win = GraphWin("virtual", 100, 100, autoflush=False)
+        self.win.setCoords(0, 0, 100, 100)
+        self.win.setVirtual()
+
+    def tearDown(self):
+        self.win.close()
+
+    def testEntryNotCulled(self):
+        entry = Entry(Point(500, 500), 5).draw(self.win)
+        self.assertIsNotNone(entry.id)
+        widget = entry.entry
+        entry.move(-450, -450)
+        self.assertIs(entry.entry, widget)
+
+    def testCulling(self):
+        near = Rectangle(Point(10, 10), Point(20, 20)).draw(self.win)
+        far = Rectangle(Point(500, 10), Point(510, 20)).draw(self.win)
+        self.assertIsNotNone(near.id)
+        self.assertIsNone(far.id)
+        far.move(-480, 0)
+        self.assertIsNotNone(far.id)
+        near.move(500, 0)
+        self.assertIsNone(near.id)
+
+    def testPixelSizedAfterZoom(self):
+        # 400 pixels wide, but indexed by its box at one unit per pixel
+        image = Image(Point(-320, 50), 400, 10).draw(self.win)
+        self.assertIsNone(image.id)
+        self.win.setCoords(0, 0, 200, 200)
+        self.assertIsNotNone(image.id)
+
+    def testTextResized(self):
+        label = Text(Point(-110, 50), "x").draw(self.win)
+        self.assertIsNone(label.id)
+        label.setText("x" * 40)
+        self.assertIsNotNone(label.id)
+
+    def testRestack(self):
+        boxes = [Rectangle(Point(10*i, 10), Point(10*i + 30, 40)) for i in range(4)]
+        self.win.drawMany(boxes)
+        boxes[1].move(500, 0)
+        boxes[1].move(-500, 0)
+        self.assertEqual(self.win.find_all(), tuple(box.id for box in boxes))
+        boxes[2].move(500, 0)
+        boxes[1].move(500, 0)
+        boxes[1].move(-500, 0)
+        boxes[2].move(-500, 0)
+        self.assertEqual(self.win.find_all(), tuple(box.id for box in boxes))
+        self.win.setCoords(0, 0, 50, 50)
+        self.assertEqual(self.win.find_all(), tuple(box.id for box in boxes))
+
+
+if __name__ == "__main__":
+    unittest.main()